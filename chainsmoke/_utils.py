@@ -21,7 +21,10 @@ LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
 OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 SOFTWARE.
 """
+from functools import update_wrapper
 import inspect
+import sys
+import types
 
 
 def get_num_positional_args(func):
@@ -40,3 +43,81 @@ def get_num_positional_args(func):
     return count
 
 
+class FunctionWrapper(object):
+    """
+    Base class for decorators that wrap a function in an object instead of a closure, so that
+    the wrapped function can be pickled and sent to another process.
+    """
+
+    def __init__(self, func):
+        """
+        :param func: the function being wrapped
+        """
+        update_wrapper(self, func, updated=())
+        self.func = func
+
+    def __get__(self, obj, objtype=None):
+        # behave like a function when used on a method so that the instance is bound
+        if obj is None:
+            return self
+
+        return types.MethodType(self, obj)
+
+    def __reduce_ex__(self, protocol):
+        # a decorated module level function can only be found in its module under its own name,
+        # so pickle it by reference; otherwise pickle the wrapped function and the settings
+        if is_global(self):
+            return self.__qualname__
+
+        return super().__reduce_ex__(protocol)
+
+
+def is_global(obj):
+    """
+    :param obj: any object
+    :return: True if the object can be found in its module under its qualified name
+    """
+    try:
+        found = sys.modules[obj.__module__]
+        for name in obj.__qualname__.split('.'):
+            found = getattr(found, name)
+    except (AttributeError, KeyError, TypeError):
+        return False
+
+    return found is obj
+
+
+class _Vectorized(object):
+    """
+    Marks a callable that does not accept attributes, e.g. a numpy ufunc, as vectorized.
+    """
+    vectorized = True
+
+    def __init__(self, func):
+        self.func = func
+
+    def __call__(self, batch):
+        return self.func(batch)
+
+
+def vectorized(func):
+    """
+    Marks a function as vectorized; Compose.map_batch, CompiledTree.next_batch and Match.dispatch_many
+    will call it once with the whole batch instead of once per element.
+    :param func: A 1-arity function that takes and returns a whole batch e.g. a numpy array
+    :return: The same function, marked as vectorized
+    """
+    try:
+        func.vectorized = True
+    except AttributeError:
+        func = _Vectorized(func)
+
+    return func
+
+
+def is_vectorized(func):
+    """
+    :param func: any func
+    :return: True if the function has been marked with vectorized
+    """
+    return getattr(func, 'vectorized', False) is True
@@ -0,0 +1,280 @@
+"""
+Benchmarks for the overhead that Chainsmoke adds to plain function calls.
+
+Run with `python -m chainsmoke.bench --help`.
+
+
+Copyright (C) 2016  Alex Hendrie Bielen
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and
+to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+The above copyright notice and this permission notice shall be included in all copies or
+substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED
+TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF
+CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+OTHER DEALINGS IN THE SOFTWARE.
+"""
+from collections import namedtuple
+import argparse
+import json
+import platform
+import sys
+import time
+
+from chainsmoke.chain import chain, compose, compile_compose, compile_funcs, combine
+from chainsmoke.decide import Decision, Action
+from chainsmoke.log import log_it
+from chainsmoke.match import Match, otherwise
+from chainsmoke.railroad import railroad_it, Either, Maybe
+from chainsmoke.validate import validate_it
+
+Regression = namedtuple('Regression', ['name', 'baseline', 'current', 'change'])
+
+DEFAULT_DEPTHS = (1, 4, 16)
+DEFAULT_SIZES = (100, 10000)
+
+
+def _increment(x):
+    return x + 1
+
+
+def _typed_increment(x: int) -> int:
+    return x + 1
+
+
+def _noop(message):
+    pass
+
+
+def _false(x):
+    return False
+
+
+def _decision_tree(depth):
+    node = Action('leaf', _increment)
+
+    for index in range(depth):
+        node = Decision('decision {index}'.format(index=index), _false, false_next=node, true_next=node)
+
+    return node
+
+
+def _match(depth):
+    match = Match()
+
+    for pattern in range(depth):
+        @match(pattern)
+        def matched(x):
+            return x
+
+    @match(otherwise)
+    def matched(x):
+        return x
+
+    return matched
+
+
+def micro_benchmarks(depth):
+    """
+    :param depth: Number of functions in each chain, or of nodes and patterns for decide and match
+    :return: dict of benchmark names to 0-arity functions
+    """
+    funcs = [_increment] * depth
+    plain = compile_funcs(funcs)
+    composed = compose(*funcs)
+    compiled = compile_compose(*funcs)
+    logged = compose(*funcs, wrap_with=log_it(_noop))
+    validated = compose(*[validate_it(_typed_increment)] * depth)
+    combined = compose(*[combine(validate_it, log_it(_noop))(_typed_increment)] * depth)
+    either = compose(*funcs, wrap_with=railroad_it(Either))
+    maybe = compose(*funcs, wrap_with=railroad_it(Maybe))
+    tree = _decision_tree(depth)
+    matched = _match(depth)
+
+    return {
+        'plain': lambda: plain(1),
+        'chain': lambda: chain(1, *funcs),
+        'compose': lambda: composed(1),
+        'compile_compose': lambda: compiled(1),
+        'log_it': lambda: logged(1),
+        'validate_it': lambda: validated(1),
+        'combine': lambda: combined(1),
+        'railroad_it.either': lambda: either(1),
+        'railroad_it.maybe': lambda: maybe(1),
+        'decision.next': lambda: tree.next(1),
+        'match': lambda: matched(depth - 1),
+    }
+
+
+def macro_benchmarks(size, depth):
+    """
+    :param size: Number of values pushed through each chain
+    :param depth: Number of functions in each chain
+    :return: dict of benchmark names to 0-arity functions
+    """
+    values = list(range(size))
+    funcs = [_increment] * depth
+    plain = compile_funcs(funcs)
+    composed = compose(*funcs)
+    compiled = compile_compose(*funcs)
+    logged = compose(*funcs, wrap_with=log_it(_noop))
+
+    return {
+        'plain': lambda: [plain(value) for value in values],
+        'compose': lambda: [composed(value) for value in values],
+        'compile_compose': lambda: [compiled(value) for value in values],
+        'compose.map_batch': lambda: composed.map_batch(values),
+        'log_it': lambda: [logged(value) for value in values],
+    }
+
+
+def measure(func, repeat=5, min_time=0.05):
+    """
+    Times a function, calling it enough times per run that a run takes at least min_time.
+    :param func: 0-arity function
+    :param repeat: Number of runs
+    :param min_time: Minimum length of a run in seconds
+    :return: the fastest time per call in seconds
+    """
+    number = 1
+
+    while True:
+        elapsed = _time_calls(func, number)
+        if elapsed >= min_time:
+            break
+        number *= 2 if elapsed * 10 > min_time else 10
+
+    best = elapsed
+    for _ in range(repeat - 1):
+        best = min(best, _time_calls(func, number))
+
+    return best / number
+
+
+def _time_calls(func, number):
+    start = time.perf_counter()
+    for _ in range(number):
+        func()
+
+    return time.perf_counter() - start
+
+
+def run_benchmarks(depths=DEFAULT_DEPTHS, sizes=DEFAULT_SIZES, repeat=5, min_time=0.05, only=None, report=None):
+    """
+    Runs every micro benchmark at each depth and every macro benchmark at each size.
+    :param depths: Iterable of chain depths
+    :param sizes: Iterable of input sizes
+    :param repeat: Number of runs per benchmark
+    :param min_time: Minimum length of a run in seconds
+    :param only: An optional substring; only benchmarks whose name contains it are run
+    :param report: An optional function that is called with the name and seconds per call of each result
+    :return: dict of benchmark names to seconds per call
+    """
+    benchmarks = []
+
+    for depth in depths:
+        for name, func in micro_benchmarks(depth).items():
+            benchmarks.append(('micro.{name}.depth={depth}'.format(name=name, depth=depth), func))
+
+    for size in sizes:
+        for name, func in macro_benchmarks(size, max(depths)).items():
+            benchmarks.append(('macro.{name}.size={size}'.format(name=name, size=size), func))
+
+    results = {}
+
+    for name, func in benchmarks:
+        if only and only not in name:
+            continue
+
+        results[name] = measure(func, repeat=repeat, min_time=min_time)
+
+        if report:
+            report(name, results[name])
+
+    return results
+
+
+def compare(results, baseline, threshold=0.1):
+    """
+    :param results: dict of benchmark names to seconds per call
+    :param baseline: dict of benchmark names to seconds per call
+    :param threshold: Fraction by which a benchmark may be slower than the baseline
+    :return: List of Regression for benchmarks that are slower than the baseline by more than the threshold
+    """
+    regressions = []
+
+    for name, current in sorted(results.items()):
+        previous = baseline.get(name)
+
+        if previous and current > previous * (1 + threshold):
+            regressions.append(Regression(name=name, baseline=previous, current=current,
+                                          change=current / previous - 1))
+
+    return regressions
+
+
+def _metadata():
+    return {
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'machine': platform.machine(),
+        'time': time.time(),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m chainsmoke.bench',
+                                     description='Measure the overhead that Chainsmoke adds to plain function calls.')
+    parser.add_argument('--depths', default=','.join(map(str, DEFAULT_DEPTHS)),
+                        help='comma separated chain depths (default: %(default)s)')
+    parser.add_argument('--sizes', default=','.join(map(str, DEFAULT_SIZES)),
+                        help='comma separated input sizes for the macro benchmarks (default: %(default)s)')
+    parser.add_argument('--repeat', type=int, default=5, help='runs per benchmark (default: %(default)s)')
+    parser.add_argument('--min-time', type=float, default=0.05,
+                        help='minimum seconds per run (default: %(default)s)')
+    parser.add_argument('--only', help='only run benchmarks whose name contains this string')
+    parser.add_argument('--output', help='write the results to this JSON file')
+    parser.add_argument('--baseline', help='compare against the results in this JSON file')
+    parser.add_argument('--threshold', type=float, default=0.1,
+                        help='fraction slower than the baseline that counts as a regression (default: %(default)s)')
+    args = parser.parse_args(argv)
+
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            baseline = json.load(baseline_file)['results']
+
+    def report(name, seconds):
+        line = '{name:<45} {usec:>12.3f} us'.format(name=name, usec=seconds * 1e6)
+        if baseline.get(name):
+            line += ' {change:>+8.1%}'.format(change=seconds / baseline[name] - 1)
+        print(line)
+
+    results = run_benchmarks(depths=[int(depth) for depth in args.depths.split(',')],
+                             sizes=[int(size) for size in args.sizes.split(',')],
+                             repeat=args.repeat,
+                             min_time=args.min_time,
+                             only=args.only,
+                             report=report)
+
+    if args.output:
+        with open(args.output, 'w') as output_file:
+            json.dump({'metadata': _metadata(), 'results': results}, output_file, indent=2, sort_keys=True)
+
+    regressions = compare(results, baseline, threshold=args.threshold)
+
+    for regression in regressions:
+        print('REGRESSION {name}: {baseline:.3f} us -> {current:.3f} us ({change:+.1%})'.format(
+            name=regression.name, baseline=regression.baseline * 1e6, current=regression.current * 1e6,
+            change=regression.change))
+
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -18,8 +18,64 @@ OTHER DEALINGS IN THE SOFTWARE.
 
 """
 from functools import reduce, partial
+from inspect import isawaitable, iscoroutinefunction
 from collections import namedtuple
+from collections.abc import Mapping
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from typing import Callable
+from weakref import WeakKeyDictionary
+import asyncio
+import inspect
+import os
+import sys
+import threading
+import time
+import weakref
+
+from chainsmoke._utils import FunctionWrapper, is_global, vectorized, is_vectorized
+from chainsmoke.railroad import Either, Good, Error, Maybe, Just, Nothing
+from chainsmoke.validate import check_args, check_return
+
+
+# wrapping function -> {function -> wrapped function}; an entry lives as long as its wrapping function
+_wrapped_funcs = WeakKeyDictionary()
+
+
+def wrap_func(wrapping_func, func):
+    """
+    Wraps a function, reusing the wrapped function from an earlier call with the same wrapping
+    function and function. Only functions that can be found in their module are cached: a wrapped
+    function keeps the function it wraps alive, so caching bound methods, partials or lambdas would
+    keep them, and whatever they refer to, alive for as long as the wrapping function.
+    :param wrapping_func: Function to wrap with
+    :param func: Function to wrap
+    :return: Wrapped function
+    """
+    wrapped_by = wrapped = None
+
+    if is_global(func):
+        try:
+            wrapped_by = _wrapped_funcs.get(wrapping_func)
+            if wrapped_by is None:
+                wrapped_by = _wrapped_funcs[wrapping_func] = WeakKeyDictionary()
+
+            wrapped = wrapped_by.get(func)
+        except TypeError:
+            # not weakly referenceable or not hashable
+            wrapped_by = wrapped = None
+
+    if wrapped is None:
+        wrapped = wrapping_func(func)
+        if is_vectorized(func):
+            wrapped = vectorized(wrapped)
+
+        if wrapped_by is not None:
+            try:
+                wrapped_by[func] = wrapped
+            except TypeError:
+                pass
+
+    return wrapped
 
 
 def wrap_funcs(wrapping_func, func_list):
@@ -32,51 +88,794 @@ def wrap_funcs(wrapping_func, func_list):
 
     for func in func_list:
         if isinstance(func, Callable):
-            wrapped_funcs.append(wrapping_func(func))
+            wrapped_funcs.append(wrap_func(wrapping_func, func))
         else:
             wrapped_funcs.append(func)
 
     return wrapped_funcs
 
 
+def _is_ndarray(value):
+    # only check for numpy arrays if numpy has already been imported by the caller
+    numpy = sys.modules.get('numpy')
+    return numpy is not None and isinstance(value, numpy.ndarray)
+
+
+def _like(values, batch):
+    if _is_ndarray(batch):
+        return sys.modules['numpy'].asarray(values)
+
+    return values
+
+
+def map_elements(func, batch):
+    """
+    Calls a function once per element of a batch.
+
+    A batch is either a sequence (such as a list or a numpy array) or a mapping of column
+    names to columns. The function is called with each row of a mapping as a dict; if every
+    call returns a dict then the results are turned back into columns.
+
+    :param func: A 1-arity function
+    :param batch: A sequence or a mapping of columns
+    :return: A batch of results of the same kind as the batch that was passed in
+    """
+    if isinstance(batch, Mapping):
+        names = list(batch)
+        results = [func(dict(zip(names, row))) for row in zip(*batch.values())]
+
+        if results and all(isinstance(result, Mapping) for result in results):
+            first_column = batch[names[0]] if names else None
+            return {name: _like([result[name] for result in results], first_column) for name in results[0]}
+
+        return _like(results, batch[names[0]]) if names else results
+
+    return _like([func(element) for element in batch], batch)
+
+
 def chain(*args, **kwargs):
     """
     Returns result of a chained computation. The first argument is treated as a value.
 
-    Optionally pass in a higher order function with the 'wrap_with' keyword argument.
+    Optionally pass in a higher order function with the 'wrap_with' keyword argument and a
+    chainsmoke.trace.Tracer with the 'tracer' keyword argument.
 
     :param args: functions you want called in a chain
     :return: result of the chain of functions
     """
     wrapping_func = kwargs.get('wrap_with')
+    tracer = kwargs.get('tracer')
 
     if wrapping_func:
         args = list(wrap_funcs(wrapping_func, args))
 
+    if tracer:
+        return TracedCompose(args[1:], tracer, name=kwargs.get('name', 'chain'))(args[0])
+
     result = reduce((lambda x, y: y(x)), args)
     return result
 
 
+class Compose(object):
+    """
+    A chain of functions that is ready to be called with a value.
+    """
+
+    def __init__(self, funcs, name='compose'):
+        """
+        :param funcs: functions you want called in a chain; adjacent Transducers are fused
+        :param name: Name of the chain, used when tracing
+        """
+        self.funcs = tuple(fuse_transducers(funcs))
+        self.name = name
+
+    def __call__(self, value):
+        for func in self.funcs:
+            value = func(value)
+
+        return value
+
+    def map_batch(self, batch):
+        """
+        Runs a whole batch through the chain in one pass. Functions marked with vectorized are
+        called once with the whole batch, all other functions are called once per element.
+        :param batch: A sequence (such as a list or a numpy array) or a mapping of column names to columns
+        :return: The batch of results
+        """
+        for func in self.funcs:
+            if isinstance(func, Compose):
+                batch = func.map_batch(batch)
+            elif is_vectorized(func):
+                batch = func(batch)
+            else:
+                batch = map_elements(func, batch)
+
+        return batch
+
+    def parallel_map(self, iterable, workers=None, chunksize=None, executor=None):
+        """
+        Calls the chain with every value of an iterable using a pool of processes. The
+        chain and the values must be picklable.
+        :param iterable: Any iterable of values
+        :param workers: Number of processes; defaults to the number of processors
+        :param chunksize: Number of values sent to a process at a time; defaults to splitting
+                          the values evenly into four chunks per process when the iterable has a length
+        :param executor: An optional concurrent.futures.ProcessPoolExecutor to reuse
+        :return: List of results in the same order as the values
+        """
+        if chunksize is None:
+            try:
+                chunksize = max(1, len(iterable) // ((workers or os.cpu_count() or 1) * 4))
+            except TypeError:
+                chunksize = 1
+
+        if executor is None:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                return list(executor.map(self, iterable, chunksize=chunksize))
+
+        return list(executor.map(self, iterable, chunksize=chunksize))
+
+
+class CompiledCompose(Compose):
+    """
+    A Compose whose chain has been flattened and generated into a single function
+    that calls every stage directly.
+    """
+
+    def __init__(self, funcs, name='compose'):
+        """
+        :param funcs: functions you want called in a chain; nested Compose objects are flattened
+        :param name: Name of the chain, used when tracing
+        """
+        super().__init__(flatten_funcs(funcs), name=name)
+        self.compiled = compile_funcs(self.funcs)
+
+    def __call__(self, value):
+        return self.compiled(value)
+
+    def __reduce__(self):
+        # the generated function cannot be pickled so it is generated again when unpickled
+        return CompiledCompose, (self.funcs, self.name)
+
+
+class TracedCompose(Compose):
+    """
+    A Compose that records a span for every call of the chain, with a child span for every
+    function in the chain. Nested Compose objects get their own child spans.
+    """
+
+    def __init__(self, funcs, tracer, name='compose'):
+        """
+        :param funcs: functions you want called in a chain
+        :param tracer: chainsmoke.trace.Tracer
+        :param name: Name of the chain's span
+        """
+        super().__init__(funcs, name=name)
+        self.tracer = tracer
+
+    def __call__(self, value):
+        return call_traced(self.tracer, self, value)
+
+
+def _span_name(func):
+    return getattr(func, '__name__', None) or repr(func)
+
+
+def call_traced(tracer, composition, value, parent=None):
+    """
+    Calls a Compose, recording a span for the chain and a child span for every function in it.
+    :param tracer: chainsmoke.trace.Tracer
+    :param composition: Compose
+    :param value: Any value
+    :param parent: An optional parent span
+    :return: result of the chain of functions
+    """
+    span = tracer.start_span(composition.name, parent=parent)
+
+    try:
+        for func in composition.funcs:
+            if isinstance(func, Compose):
+                value = call_traced(tracer, func, value, parent=span)
+                continue
+
+            stage_span = tracer.start_span(_span_name(func), parent=span)
+            try:
+                value = func(value)
+            except Exception as e:
+                tracer.finish_span(stage_span, e)
+                raise
+            tracer.finish_span(stage_span)
+    except Exception as e:
+        tracer.finish_span(span, e)
+        raise
+
+    tracer.finish_span(span)
+    return value
+
+
+def flatten_funcs(func_list):
+    """
+    Inlines the stages of any nested Compose objects.
+    :param func_list: List of functions
+    :return: List of functions without any nested Compose objects
+    """
+    flat_funcs = []
+
+    for func in func_list:
+        if isinstance(func, Compose):
+            flat_funcs.extend(flatten_funcs(func.funcs))
+        else:
+            flat_funcs.append(func)
+
+    return flat_funcs
+
+
+def compile_funcs(func_list):
+    """
+    Generates a function that calls each function in turn without a loop or any
+    allocation per call.
+    :param func_list: List of functions
+    :return: A 1-arity function
+    """
+    names = ['f{index}'.format(index=index) for index in range(len(func_list))]
+    lines = ['def make_compiled({names}):'.format(names=', '.join(names)),
+             '    def compiled(value):']
+    lines.extend('        value = {name}(value)'.format(name=name) for name in names)
+    lines.extend(['        return value',
+                  '    return compiled'])
+
+    namespace = {}
+    exec('\n'.join(lines), namespace)
+    return namespace['make_compiled'](*func_list)
+
+
 def compose(*args, **kwargs):
     """
     Returns function representing a chain of functions that is ready to be called with
     a value.
 
-    Optionally pass in a higher order function with the 'wrap_with' keyword argument.
+    Optionally pass in a higher order function with the 'wrap_with' keyword argument and a
+    chainsmoke.trace.Tracer with the 'tracer' keyword argument.
+
+    :param args: functions you want called in a chain
+    :return: result of the chain of functions
+    """
+    wrapping_func = kwargs.get('wrap_with')
+    tracer = kwargs.get('tracer')
+    name = kwargs.get('name', 'compose')
+
+    if wrapping_func:
+        args = wrap_funcs(wrapping_func, args)
+
+    if tracer:
+        return TracedCompose(args, tracer, name=name)
+
+    return Compose(args, name=name)
+
+
+def compile_compose(*args, **kwargs):
+    """
+    Same as compose but flattens any nested compositions and generates a single function
+    for the chain when it is built, so that calling it costs one direct call per stage.
+
+    Optionally pass in a higher order function with the 'wrap_with' keyword argument and a
+    chainsmoke.trace.Tracer with the 'tracer' keyword argument.
 
     :param args: functions you want called in a chain
     :return: result of the chain of functions
     """
     wrapping_func = kwargs.get('wrap_with')
+    tracer = kwargs.get('tracer')
+    name = kwargs.get('name', 'compose')
+
+    if wrapping_func:
+        args = wrap_funcs(wrapping_func, args)
+
+    # a traced chain has to call its functions one at a time so it is not compiled
+    if tracer:
+        return TracedCompose(args, tracer, name=name)
+
+    return CompiledCompose(args, name=name)
+
+
+class AsyncCompose(object):
+    """
+    A chain of functions, some of which may be coroutine functions, that is ready to be awaited
+    with a value. Awaitable results are awaited before being passed to the next function.
+    """
+
+    def __init__(self, funcs):
+        """
+        :param funcs: functions or coroutine functions you want called in a chain
+        """
+        self.funcs = tuple(fuse_transducers(funcs))
+        # branches run their sub-chains on the event loop instead of on threads
+        self._calls = tuple(func.call_async if isinstance(func, Branch) else func for func in self.funcs)
+
+    async def __call__(self, value):
+        if isawaitable(value):
+            value = await value
+
+        for func in self._calls:
+            value = func(value)
+
+            if isawaitable(value):
+                value = await value
+
+        return value
+
+    async def map(self, values, concurrency=100):
+        """
+        Awaits the chain for every value of an iterable with at most 'concurrency' chains in flight
+        at a time.
+        :param values: Any iterable of values
+        :param concurrency: Maximum number of chains awaited at the same time
+        :return: List of results in the same order as the values
+        :raises ValueError: if concurrency is less than 1
+        """
+        if concurrency < 1:
+            raise ValueError("concurrency must be at least 1; got {concurrency}".format(concurrency=concurrency))
+
+        results = []
+        indexed_values = enumerate(values)
+
+        async def worker():
+            for index, value in indexed_values:
+                results.append((index, await self(value)))
+
+        workers = [asyncio.ensure_future(worker()) for _ in range(concurrency)]
+        try:
+            await asyncio.gather(*workers)
+        finally:
+            # stop the other workers when one of them fails or map itself is cancelled
+            for task in workers:
+                task.cancel()
+
+        results.sort(key=lambda indexed_result: indexed_result[0])
+        return [result for _, result in results]
+
+
+def async_chain(*args, **kwargs):
+    """
+    Same as chain but awaits the results of coroutine functions; returns a coroutine.
+
+    Optionally pass in a higher order function with the 'wrap_with' keyword argument.
+
+    :param args: functions you want called in a chain
+    :return: awaitable result of the chain of functions
+    """
+    if not args:
+        raise TypeError('async_chain expects at least one argument')
+
+    value, funcs = args[0], args[1:]
+    return async_compose(*funcs, **kwargs)(value)
+
+
+def async_compose(*args, **kwargs):
+    """
+    Same as compose but the returned function is a coroutine function that awaits the
+    results of coroutine functions.
+
+    Optionally pass in a higher order function with the 'wrap_with' keyword argument.
+
+    :param args: functions you want called in a chain
+    :return: AsyncCompose
+    """
+    wrapping_func = kwargs.get('wrap_with')
 
     if wrapping_func:
         args = wrap_funcs(wrapping_func, args)
 
-    def compose_inner(value):
-        result = reduce((lambda x, y: y(x)), [value] + list(args))
+    return AsyncCompose(args)
+
+
+def _as_tuple(*results):
+    return results
+
+
+class Branch(object):
+    """
+    Calls several functions or chains with the same value concurrently and joins their results,
+    so that a chain can fan out to independent stages and fan back in.
+
+    An executor that is passed in belongs to the caller and is never shut down by the Branch.
+    Without one the Branch starts its own thread pool on first use; call close(), or use the
+    Branch as a context manager, to shut that pool down once the Branch is no longer needed.
+    """
+
+    def __init__(self, funcs, join=_as_tuple, executor=None):
+        """
+        :param funcs: 1-arity functions, Compose or AsyncCompose objects to be called with the same value
+        :param join: A function called with the result of each function, in order; defaults to returning a tuple
+        :param executor: An optional concurrent.futures.Executor, owned by the caller; defaults to a thread pool
+                         owned by the Branch
+        """
+        self.funcs = tuple(funcs)
+        self.join = join
+        self.executor = executor
+        self._is_async = tuple(isinstance(func, AsyncCompose) or iscoroutinefunction(func) for func in self.funcs)
+        self._owned_executor = None
+        self._finalizer = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self):
+        if self.executor is not None:
+            return self.executor
+
+        with self._lock:
+            if self._owned_executor is None:
+                self._owned_executor = ThreadPoolExecutor(thread_name_prefix='chainsmoke-branch')
+                # a Branch that is dropped without being closed still shuts its pool down
+                self._finalizer = weakref.finalize(self, self._owned_executor.shutdown, wait=False)
+
+        return self._owned_executor
+
+    def close(self, wait=True):
+        """
+        Shuts down the thread pool owned by the Branch, if one was started; an executor passed in
+        is left alone. The Branch starts a new pool if it is called again.
+        :param wait: If True waits for pending calls to finish
+        """
+        with self._lock:
+            owned_executor, self._owned_executor = self._owned_executor, None
+            finalizer, self._finalizer = self._finalizer, None
+
+        if finalizer is not None:
+            # the finalizer would otherwise keep the closed pool alive for as long as the Branch
+            finalizer.detach()
+
+        if owned_executor is not None:
+            owned_executor.shutdown(wait=wait)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __call__(self, value):
+        if not self.funcs:
+            return self.join()
+
+        # the first function runs on the calling thread while the others run on the executor
+        executor = self._get_executor()
+        futures = [executor.submit(func, value) for func in self.funcs[1:]]
+        first = self.funcs[0](value)
+        return self.join(first, *[future.result() for future in futures])
+
+    async def call_async(self, value):
+        """
+        Awaits coroutine functions and AsyncCompose objects on the running event loop and runs the
+        other functions on the executor.
+        :param value: Any value
+        :return: the joined results
+        """
+        loop = asyncio.get_running_loop()
+        awaitables = []
+
+        for func, is_async in zip(self.funcs, self._is_async):
+            if is_async:
+                awaitables.append(func(value))
+            else:
+                awaitables.append(loop.run_in_executor(self._get_executor(), func, value))
+
+        return self.join(*await asyncio.gather(*awaitables))
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_owned_executor'] = None
+        state['_finalizer'] = None
+        del state['_lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+
+def branch(*args, **kwargs):
+    """
+    Returns a function that calls each of the functions with the same value concurrently, on a
+    thread pool or on the running event loop when used in async_compose, and calls 'join' with
+    their results. The total time is that of the slowest function rather than the sum of them all.
+
+    :param args: functions or chains you want called with the same value
+    :param join: A function called with the result of each function; defaults to returning a tuple
+    :param executor: An optional concurrent.futures.Executor
+    :return: Branch
+    """
+    return Branch(args, join=kwargs.get('join', _as_tuple), executor=kwargs.get('executor'))
+
+
+class Reduced(object):
+    """
+    Wraps the result of a reducing step to signal that the reduction should stop early.
+    """
+
+    def __init__(self, value):
+        self.value = value
+
+
+def _append(items, item):
+    items.append(item)
+    return items
+
+
+class Transducer(object):
+    """
+    A composable reducing transformation. Calling a Transducer with an iterable lazily yields
+    the transformed items in a single pass, so it can be used as a stage in chain or compose
+    and works with unbounded generators.
+    """
+
+    def __init__(self, *xforms):
+        """
+        :param xforms: functions that take a reducing step function and return a new one
+        """
+        self.xforms = xforms
+
+    def __call__(self, iterable):
+        items = []
+        step = self.xform(_append)
+
+        for item in iterable:
+            result = step(items, item)
+
+            if items:
+                yield from items
+                items.clear()
+
+            if isinstance(result, Reduced):
+                return
+
+    def xform(self, step):
+        """
+        :param step: A reducing function that takes an accumulated result and an item
+        :return: The reducing function transformed by every xform; the first xform sees items first
+        """
+        for xform in reversed(self.xforms):
+            step = xform(step)
+
+        return step
+
+    def reduce(self, func, iterable, initial):
+        """
+        Reduces the transformed items of an iterable without building any intermediate collection.
+        :param func: A reducing function that takes an accumulated result and an item
+        :param iterable: Any iterable
+        :param initial: The initial accumulated result
+        :return: The accumulated result
+        """
+        step = self.xform(func)
+        result = initial
+
+        for item in iterable:
+            result = step(result, item)
+
+            if isinstance(result, Reduced):
+                return result.value
+
         return result
 
-    return compose_inner
+
+def transduce(*transducers):
+    """
+    Fuses transducers into a single Transducer that makes one pass over its source.
+    :param transducers: Transducer objects
+    :return: Transducer
+    """
+    xforms = []
+
+    for transducer in transducers:
+        xforms.extend(transducer.xforms)
+
+    return Transducer(*xforms)
+
+
+def fuse_transducers(func_list):
+    """
+    Fuses runs of adjacent Transducers in a list of functions.
+    :param func_list: List of functions
+    :return: List of functions without adjacent Transducers
+    """
+    fused_funcs = []
+
+    for func in func_list:
+        if isinstance(func, Transducer) and fused_funcs and isinstance(fused_funcs[-1], Transducer):
+            fused_funcs[-1] = transduce(fused_funcs[-1], func)
+        else:
+            fused_funcs.append(func)
+
+    return fused_funcs
+
+
+def mapping(func):
+    """
+    :param func: A 1-arity function
+    :return: Transducer that calls the function on every item
+    """
+    def mapping_xform(step):
+        def mapping_step(result, item):
+            return step(result, func(item))
+
+        return mapping_step
+
+    return Transducer(mapping_xform)
+
+
+def filtering(predicate):
+    """
+    :param predicate: A 1-arity function that returns a boolean
+    :return: Transducer that keeps the items for which the predicate is True
+    """
+    def filtering_xform(step):
+        def filtering_step(result, item):
+            if predicate(item):
+                return step(result, item)
+
+            return result
+
+        return filtering_step
+
+    return Transducer(filtering_xform)
+
+
+def taking(n):
+    """
+    :param n: Number of items to take
+    :return: Transducer that stops after n items
+    """
+    def taking_xform(step):
+        remaining = n
+
+        def taking_step(result, item):
+            nonlocal remaining
+
+            if remaining <= 0:
+                return Reduced(result)
+
+            remaining -= 1
+            result = step(result, item)
+
+            if remaining <= 0 and not isinstance(result, Reduced):
+                return Reduced(result)
+
+            return result
+
+        return taking_step
+
+    return Transducer(taking_xform)
+
+
+def deduping():
+    """
+    :return: Transducer that drops items that are equal to the item right before them
+    """
+    def deduping_xform(step):
+        previous = _nothing = object()
+
+        def deduping_step(result, item):
+            nonlocal previous
+
+            if previous is not _nothing and item == previous:
+                return result
+
+            previous = item
+            return step(result, item)
+
+        return deduping_step
+
+    return Transducer(deduping_xform)
+
+
+def flat_mapping(func):
+    """
+    :param func: A 1-arity function that returns an iterable
+    :return: Transducer that passes on every item of every iterable returned by the function
+    """
+    def flat_mapping_xform(step):
+        def flat_mapping_step(result, item):
+            for inner_item in func(item):
+                result = step(result, inner_item)
+
+                if isinstance(result, Reduced):
+                    return result
+
+            return result
+
+        return flat_mapping_step
+
+    return Transducer(flat_mapping_xform)
+
+
+class Combined(FunctionWrapper):
+    """
+    A function wrapped with the behaviour of several Chainsmoke decorators in a single layer.
+    From the outside in: railroad_it, log_it, retry and validate_it.
+    """
+
+    def __init__(self, func, validate=False, log=None, retry=None, railroad=None):
+        """
+        :param func: function to be wrapped
+        :param validate: If True the arguments and return value are validated like validate_it
+        :param log: An optional decorator returned by log_it
+        :param retry: An optional decorator returned by functools.retry
+        :param railroad: An optional decorator returned by railroad_it
+        """
+        super().__init__(func)
+        self.func_name = func.__name__
+        self.validate = validate
+
+        if validate:
+            self.types = func.__annotations__
+            self.param_names = inspect.getargs(func.__code__).args
+
+        self.logger = log.logger if log else None
+        if log:
+            self.input_string = log.input_string
+            self.output_string = log.output_string
+
+        # an empty tuple of exceptions catches nothing, so without retry the call is made exactly once
+        self.num_retries = retry.num_retries if retry else 0
+        self.pause = retry.pause if retry else 0
+        self.retry_case = retry.case if retry else ()
+
+        self.railroad_type = railroad.railroad_type if railroad else None
+        self.debug = railroad.debug if railroad else False
+
+    def __call__(self, *args, **kwargs):
+        railroad_type = self.railroad_type
+
+        # on a method the instance is bound ahead of the railroad value
+        if railroad_type is Either:
+            *bound, either = args
+            if isinstance(either, Error):
+                return Error(either.value)
+            if isinstance(either, Good):
+                args = (*bound, either.value)
+        elif railroad_type is Maybe:
+            *bound, maybe = args
+            if isinstance(maybe, Nothing):
+                return Nothing()
+            if isinstance(maybe, Just):
+                args = (*bound, maybe.value)
+
+        try:
+            if self.logger:
+                self.logger(self.input_string.format(func_name=self.func_name, args=args, kwargs=kwargs))
+
+            attempt = 0
+            while True:
+                try:
+                    if self.validate:
+                        check_args(self.func_name, self.types, self.param_names, args, kwargs)
+                        return_type = self.types['return']
+                        result = self.func(*args, **kwargs)
+                        check_return(self.func_name, return_type, result)
+                    else:
+                        result = self.func(*args, **kwargs)
+                    break
+                except self.retry_case as e:
+                    if attempt >= self.num_retries:
+                        result = e
+                        break
+                    attempt += 1
+                    time.sleep(self.pause)
+
+            if self.logger:
+                self.logger(self.output_string.format(func_name=self.func_name, result=result))
+        except Exception as e:
+            if railroad_type is None or self.debug:
+                raise
+
+            return Error(e) if railroad_type is Either else Nothing()
+
+        if railroad_type is Either:
+            return Good(result)
+        elif railroad_type is Maybe:
+            return Just(result)
+
+        return result
 
 
 def combine(*args: Callable) -> Callable:
@@ -87,31 +886,35 @@ def combine(*args: Callable) -> Callable:
     helps to abstract that order by ordering the desired decorators
     instead of having the user remember the order.
 
-    2) Some decorators will lose functionality when used in combination. This
-    function adds that functionality back by passing attributes of the original
-    function into the decorators.
+    2) Stacked decorators add a layer of calls for every decorator. This function
+    fuses the decorators into a single wrapper that behaves like the stacked decorators.
+
+    Accepts validate_it and the decorators returned by log_it, functools.retry and railroad_it.
 
     :param args: Any number of chainsmoke decorator functions
     :return: A single decorator function with the functionality of the combined decorators
     """
-    order = {
-        'validate_it': 0,
-        'log_it_decorator': 1
-    }
-    sorted_decorators = sorted(args, key=lambda x: order[x.__name__])
+    decorators = {}
 
-    def decorator(func):
-        def inner(*args, **kwargs):
-            return func(*args, **kwargs)
+    for dec in args:
+        if dec.__name__ not in COMBINABLE_DECORATORS:
+            raise TypeError('{name} cannot be combined; try validate_it, log_it, retry or railroad_it'.format(
+                name=dec.__name__))
+        decorators[COMBINABLE_DECORATORS[dec.__name__]] = dec
 
-        inner.__name__ = func.__name__
-        inner.__annotations__ = func.__annotations__
-        inner.overridden_varnames = func.__code__.co_varnames
+    def decorator(func):
+        return Combined(func,
+                        validate='validate' in decorators,
+                        log=decorators.get('log'),
+                        retry=decorators.get('retry'),
+                        railroad=decorators.get('railroad'))
 
-        for dec in sorted_decorators:
-            inner = dec(inner)
-            inner.__name__ = func.__name__
+    return decorator
 
-        return inner
 
-    return decorator
+COMBINABLE_DECORATORS = {
+    'validate_it': 'validate',
+    'retry_decorator': 'retry',
+    'log_it_decorator': 'log',
+    'railroad_it_decorator': 'railroad',
+}
@@ -0,0 +1,282 @@
+"""
+Incremental re-evaluation of chains of functions using checkpointed intermediate values.
+
+
+Copyright (C) 2016  Alex Hendrie Bielen
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and
+to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+The above copyright notice and this permission notice shall be included in all copies or
+substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED
+TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF
+CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+OTHER DEALINGS IN THE SOFTWARE.
+"""
+from collections import OrderedDict
+from collections.abc import Iterator
+from functools import partial
+import hashlib
+import os
+import pickle
+import tempfile
+import threading
+
+from chainsmoke.chain import flatten_funcs, wrap_funcs
+
+MISSING = object()
+
+
+def _stable_bytes(value):
+    # sets and dicts are sorted, since their order changes with the hash seed of each process
+    if type(value) in (set, frozenset):
+        return pickle.dumps((type(value).__name__, sorted(map(_stable_bytes, value))), protocol=4)
+
+    if type(value) is dict:
+        return pickle.dumps(('dict', sorted((_stable_bytes(key), _stable_bytes(item))
+                                            for key, item in value.items())), protocol=4)
+
+    if type(value) in (list, tuple):
+        return pickle.dumps((type(value).__name__, [_stable_bytes(item) for item in value]), protocol=4)
+
+    return pickle.dumps(value, protocol=4)
+
+
+def input_key(value):
+    """
+    Makes a stable key for an input from a digest of its pickle, so that equal inputs share their
+    checkpoints across runs even when they are unhashable or have a truncated repr. The contents of
+    sets and dicts are sorted first so that the key doesn't depend on their order.
+    :param value: Any picklable value
+    :return: string
+    :raises TypeError: if the value can't be pickled; pass a key for such inputs
+    """
+    try:
+        data = _stable_bytes(value)
+    except Exception as e:
+        raise TypeError("cannot make a checkpoint key for {value_type}: {error}; pass a key for such inputs".format(
+            value_type=type(value).__qualname__, error=e))
+
+    return hashlib.sha1(data).hexdigest()
+
+
+def _value_identity(value, seen):
+    if callable(value):
+        return _stage_identity(value, seen)
+
+    try:
+        return input_key(value)
+    except TypeError:
+        return repr(value)
+
+
+def _hash_code(code, digest):
+    digest.update(code.co_code)
+    digest.update(repr((code.co_names, code.co_varnames, code.co_freevars, code.co_cellvars)).encode())
+
+    for const in code.co_consts:
+        if hasattr(const, 'co_code'):
+            _hash_code(const, digest)
+        else:
+            # constants are literals, e.g. the frozenset of 'x in {...}', so they can always be pickled
+            digest.update(_stable_bytes(const))
+
+
+def _stage_identity(func, seen):
+    name = '{module}.{qualname}'.format(module=getattr(func, '__module__', None),
+                                        qualname=getattr(func, '__qualname__', type(func).__qualname__))
+    version = getattr(func, 'version', None)
+
+    if version is not None:
+        return '{name}@{version}'.format(name=name, version=version)
+
+    # a recursive closure refers to itself
+    if id(func) in seen:
+        return name
+    seen = seen | {id(func)}
+
+    if isinstance(func, partial):
+        return 'partial({func}, {args}, {kwargs})'.format(
+            func=_stage_identity(func.func, seen), args=[_value_identity(arg, seen) for arg in func.args],
+            kwargs=sorted((key, _value_identity(arg, seen)) for key, arg in func.keywords.items()))
+
+    code = getattr(func, '__code__', None)
+    if code is not None:
+        digest = hashlib.sha1()
+        _hash_code(code, digest)
+
+        for value in (getattr(func, '__defaults__', None) or ()):
+            digest.update(_value_identity(value, seen).encode())
+        for key, value in sorted((getattr(func, '__kwdefaults__', None) or {}).items()):
+            digest.update('{key}={value}'.format(key=key, value=_value_identity(value, seen)).encode())
+        for cell in (getattr(func, '__closure__', None) or ()):
+            try:
+                contents = cell.cell_contents
+            except ValueError:
+                # an empty cell
+                continue
+            digest.update(_value_identity(contents, seen).encode())
+
+        return '{name}#{digest}'.format(name=name, digest=digest.hexdigest()[:16])
+
+    wrapped = getattr(func, '__wrapped__', None)
+    if wrapped is not None:
+        return '{wrapper}({func})'.format(wrapper=type(func).__qualname__, func=_stage_identity(wrapped, seen))
+
+    return repr(func)
+
+
+def stage_identity(func):
+    """
+    Describes a function so that a changed function gets a different identity. Functions with a
+    'version' attribute are identified by their name and version; other functions by their name and
+    a digest of their code, the names it uses, its defaults and the values captured by its closure.
+    Globals that the function reads are not part of the digest, so give such functions a version.
+    :param func: any func
+    :return: string
+    """
+    return _stage_identity(func, frozenset())
+
+
+class MemoryCheckpointStore(object):
+    """
+    Keeps checkpoints in memory, evicting the least recently used checkpoint first.
+    """
+
+    def __init__(self, maxsize=10000):
+        """
+        :param maxsize: Maximum number of checkpoints
+        """
+        self.maxsize = maxsize
+        self.checkpoints = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            value = self.checkpoints.get(key, MISSING)
+
+            if value is MISSING:
+                return default
+
+            self.checkpoints.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self.checkpoints[key] = value
+            self.checkpoints.move_to_end(key)
+
+            if len(self.checkpoints) > self.maxsize:
+                self.checkpoints.popitem(last=False)
+
+
+class DiskCheckpointStore(object):
+    """
+    Keeps each checkpoint in its own pickle file in a directory.
+    """
+
+    def __init__(self, directory):
+        """
+        :param directory: Directory for the checkpoint files; created if it does not exist
+        """
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, input_key(key) + '.pickle')
+
+    def get(self, key, default=None):
+        try:
+            with open(self._path(key), 'rb') as checkpoint_file:
+                return pickle.load(checkpoint_file)
+        except FileNotFoundError:
+            return default
+
+    def set(self, key, value):
+        # write to a temporary file first so that readers never see a partial checkpoint
+        file_descriptor, temporary_path = tempfile.mkstemp(dir=self.directory)
+        with os.fdopen(file_descriptor, 'wb') as checkpoint_file:
+            pickle.dump(value, checkpoint_file)
+
+        os.replace(temporary_path, self._path(key))
+
+
+class IncrementalCompose(object):
+    """
+    A chain of functions that stores the value after every function for each input. When it is
+    called again with the same input, only the functions after the last stored checkpoint are
+    called, so changing the last functions of a long chain only recomputes those functions.
+    Values that are iterators, such as the results of map or a Transducer, are not stored.
+    """
+
+    def __init__(self, funcs, store, key=None):
+        """
+        :param funcs: functions you want called in a chain; nested Compose objects are flattened
+        :param store: Any object with get(key, default) and set(key, value) methods
+        :param key: An optional function that returns the key of an input; defaults to input_key, a digest
+                    of the pickled input
+        """
+        self.funcs = tuple(flatten_funcs(funcs))
+        self.store = store
+        self.key = key
+
+        # the checkpoint after a function depends on that function and every function before it
+        self.fingerprints = []
+        digest = hashlib.sha1()
+        for func in self.funcs:
+            digest.update(stage_identity(func).encode())
+            self.fingerprints.append(digest.hexdigest())
+
+    def __call__(self, value, key=None):
+        """
+        :param value: Any value
+        :param key: An optional key for the value; overrides the key function
+        :return: result of the chain of functions
+        """
+        if key is None:
+            key = self.key(value) if self.key else input_key(value)
+
+        start = 0
+        for index in range(len(self.funcs) - 1, -1, -1):
+            checkpoint = self.store.get((key, self.fingerprints[index]), MISSING)
+
+            if checkpoint is not MISSING:
+                start = index + 1
+                value = checkpoint
+                break
+
+        for index in range(start, len(self.funcs)):
+            value = self.funcs[index](value)
+
+            # an iterator is used up by the next function, so resuming from it would give nothing
+            if not isinstance(value, Iterator):
+                self.store.set((key, self.fingerprints[index]), value)
+
+        return value
+
+
+def incremental_compose(*args, **kwargs):
+    """
+    Same as compose but checkpoints the value after every function for each input; see IncrementalCompose.
+
+    Optionally pass in a higher order function with the 'wrap_with' keyword argument.
+
+    :param args: functions you want called in a chain
+    :param store: Checkpoint store; defaults to a MemoryCheckpointStore
+    :param key: An optional function that returns the key of an input
+    :return: IncrementalCompose
+    """
+    wrapping_func = kwargs.get('wrap_with')
+
+    if wrapping_func:
+        args = wrap_funcs(wrapping_func, args)
+
+    store = kwargs.get('store')
+    if store is None:
+        store = MemoryCheckpointStore()
+
+    return IncrementalCompose(args, store, key=kwargs.get('key'))
@@ -18,9 +18,23 @@ THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABI
 CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
 OTHER DEALINGS IN THE SOFTWARE.
 """
-
-from collections import namedtuple
+from array import array
+from bisect import bisect_left
+from collections import namedtuple, Counter
+from collections.abc import Mapping
+from inspect import isawaitable
+from operator import attrgetter, itemgetter
+from time import monotonic, perf_counter
 from typing import Any, Callable, Union
+import asyncio
+import json
+import mmap
+import os
+import struct
+import sys
+
+from chainsmoke._utils import is_vectorized
+from chainsmoke.functools import Memoized
 
 Result = namedtuple('Result', ['value', 'path'])
 
@@ -40,6 +54,8 @@ class Decision(object):
     """
     Represents a binary choice node.
     """
+    # set by profile_tree
+    profile = None
 
     def __init__(self, name: str, predicate: Callable[[Any], bool], false_next: DecisionType, true_next: DecisionType):
         """
@@ -65,7 +81,12 @@ class Decision(object):
         else:
             path = path + self.name + " -> "
 
-        if self.predicate(data):
+        if self.profile is None:
+            outcome = self.predicate(data)
+        else:
+            outcome = self.profile.call_predicate(self, data)
+
+        if outcome:
             result = self.true_next
         else:
             result = self.false_next
@@ -77,6 +98,8 @@ class Action(object):
     """
     Represents a leaf node in the decision tree.
     """
+    # set by profile_tree
+    profile = None
 
     def __init__(self, name: str, action: Callable[[Any], Any]):
         """
@@ -86,6 +109,934 @@ class Action(object):
         self.name = name
         self.action = action
 
-    def next(self, data: Any, path: str) -> Result:
-        result = self.action(data)
+    def next(self, data: Any, path: str = '') -> Result:
+        if self.profile is None:
+            result = self.action(data)
+        else:
+            result = self.profile.call_action(self, data)
+
         return Result(value=result, path=path + self.name)
+
+
+class KeyEquals(object):
+    """
+    A predicate that is True when data[key] == value, or getattr(data, key) == value with attribute=True.
+    compile_tree turns a chain of KeyEquals decisions on the same key, linked by their false_next,
+    into a single dict lookup.
+    """
+
+    def __init__(self, key, value, attribute: bool = False):
+        """
+        :param key: The key, or attribute name, to compare
+        :param value: The value to compare with
+        :param attribute: If True the key is an attribute name
+        """
+        self.key = key
+        self.value = value
+        self.attribute = attribute
+        self.getter = attrgetter(key) if attribute else itemgetter(key)
+
+    def __call__(self, data: Any) -> bool:
+        return self.getter(data) == self.value
+
+    def __repr__(self):
+        return 'KeyEquals({key!r}, {value!r}{attribute})'.format(key=self.key, value=self.value,
+                                                              attribute=', attribute=True' if self.attribute else '')
+
+
+Switch = namedtuple('Switch', ['getter', 'cases', 'default'])
+
+DECISION = 0
+ACTION = 1
+
+
+class TreeResult(object):
+    """
+    The result of a CompiledTree. The path is kept as the ids of the nodes that were visited and is
+    only rendered as a string when it is asked for. Like the matching Result it can be unpacked,
+    indexed and hashed, and it compares equal to that Result.
+    """
+    __slots__ = ('value', 'path_ids', 'names')
+
+    def __init__(self, value, path_ids, names):
+        """
+        :param value: The value returned by the action
+        :param path_ids: Sequence of node ids from the root to the action
+        :param names: Sequence of node names indexed by node id
+        """
+        self.value = value
+        self.path_ids = path_ids
+        self.names = names
+
+    @property
+    def path(self):
+        return ' -> '.join(self.names[node_id] for node_id in self.path_ids)
+
+    def __iter__(self):
+        yield self.value
+        yield self.path
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return tuple(self)[index]
+
+        # the path is only rendered when it is the item asked for
+        if index in (0, -2):
+            return self.value
+        if index in (1, -1):
+            return self.path
+
+        raise IndexError('TreeResult index out of range')
+
+    def __len__(self):
+        return 2
+
+    def __eq__(self, other):
+        if isinstance(other, (tuple, TreeResult)):
+            return tuple(self) == tuple(other)
+
+        return NotImplemented
+
+    def __hash__(self):
+        return hash((self.value, self.path))
+
+    def __repr__(self):
+        return 'TreeResult(value={value!r}, path={path!r})'.format(value=self.value, path=self.path)
+
+
+class CompiledTree(object):
+    """
+    A decision tree flattened into arrays indexed by node id and evaluated with a loop instead of
+    recursion. The root is node 0.
+    """
+
+    def __init__(self, names, kinds, funcs, false_next, true_next, cache_size=None):
+        """
+        :param names: Sequence of node names
+        :param kinds: Sequence of DECISION or ACTION
+        :param funcs: Sequence of predicates for decisions and actions for actions
+        :param false_next: Sequence of the node ids that follow a False predicate; -1 for actions
+        :param true_next: Sequence of the node ids that follow a True predicate; -1 for actions
+        :param cache_size: Optional maximum number of results to cache by input; only use this
+                           when the predicates and actions are pure and the inputs are hashable
+        """
+        self.names = names
+        self.kinds = kinds
+        self.funcs = funcs
+        self.false_next = false_next
+        self.true_next = true_next
+
+        # a predicate object used at more than one node is only called once per traversal
+        self.predicate_slots = array('i')
+        slots = {}
+        uses = Counter()
+        for node_id, func in enumerate(funcs):
+            if kinds[node_id] == DECISION:
+                slot = slots.setdefault(id(func), len(slots))
+                uses[slot] += 1
+            else:
+                slot = -1
+            self.predicate_slots.append(slot)
+
+        self.shares_predicates = any(count > 1 for count in uses.values())
+        self.switches = self._find_switches()
+
+        if self.shares_predicates or self.switches:
+            self.resolve = self._resolve_with_shared_predicates_and_switches
+
+        self.cache = None
+        if cache_size:
+            # predicates may tell 1, 1.0 and True apart even though they are equal
+            self.cache = Memoized(self._next, maxsize=cache_size, typed=True)
+            self.next = self.cache
+
+    def resolve(self, data: Any):
+        """
+        Walks the tree without calling the action.
+        :param data: Any value
+        :return: The id of the action node and the array of node ids on the path to it
+        """
+        kinds = self.kinds
+        funcs = self.funcs
+        false_next = self.false_next
+        true_next = self.true_next
+
+        path_ids = array('i')
+        node_id = 0
+
+        while kinds[node_id] == DECISION:
+            path_ids.append(node_id)
+            node_id = true_next[node_id] if funcs[node_id](data) else false_next[node_id]
+
+        path_ids.append(node_id)
+        return node_id, path_ids
+
+    def _find_switches(self):
+        """
+        Finds the chains of KeyEquals decisions on the same key that are linked by their false_next
+        and builds a Switch for the first decision of each chain. Each case of a Switch maps a value
+        to the node that follows and the ids of the decisions that the linear walk would have visited.
+        """
+        kinds = self.kinds
+        funcs = self.funcs
+        false_next = self.false_next
+        true_next = self.true_next
+
+        def field(node_id):
+            func = funcs[node_id]
+            if kinds[node_id] == DECISION and isinstance(func, KeyEquals):
+                return func.attribute, func.key
+
+            return None
+
+        inside_chain = set()
+        for node_id in range(len(kinds)):
+            if field(node_id) is not None and field(node_id) == field(false_next[node_id]):
+                inside_chain.add(false_next[node_id])
+
+        switches = {}
+        for head in range(len(kinds)):
+            head_field = field(head)
+            if head_field is None or head in inside_chain or field(false_next[head]) != head_field:
+                continue
+
+            cases = {}
+            chain = []
+            node_id = head
+
+            try:
+                while field(node_id) == head_field:
+                    chain.append(node_id)
+                    # an earlier decision for the same value wins, as it would in the linear walk
+                    cases.setdefault(funcs[node_id].value, (true_next[node_id], tuple(chain)))
+                    node_id = false_next[node_id]
+            except TypeError:
+                # unhashable values can only be compared one at a time
+                continue
+
+            switches[head] = Switch(getter=funcs[head].getter, cases=cases, default=(node_id, tuple(chain)))
+
+        return switches
+
+    def _resolve_with_shared_predicates_and_switches(self, data: Any):
+        kinds = self.kinds
+        funcs = self.funcs
+        false_next = self.false_next
+        true_next = self.true_next
+        predicate_slots = self.predicate_slots
+        switches = self.switches
+
+        outcomes = {}
+        path_ids = array('i')
+        node_id = 0
+
+        while kinds[node_id] == DECISION:
+            switch = switches.get(node_id)
+
+            if switch is not None:
+                try:
+                    node_id, visited = switch.cases.get(switch.getter(data), switch.default)
+                    path_ids.extend(visited)
+                    continue
+                except TypeError:
+                    # an unhashable value is compared one decision at a time
+                    pass
+
+            path_ids.append(node_id)
+            slot = predicate_slots[node_id]
+
+            outcome = outcomes.get(slot)
+            if outcome is None:
+                outcome = outcomes[slot] = bool(funcs[node_id](data))
+
+            node_id = true_next[node_id] if outcome else false_next[node_id]
+
+        path_ids.append(node_id)
+        return node_id, path_ids
+
+    def next(self, data: Any) -> TreeResult:
+        """
+        Evaluates the tree.
+        :param data: Any value
+        :return: TreeResult
+        """
+        return self._next(data)
+
+    def _next(self, data):
+        node_id, path_ids = self.resolve(data)
+        return TreeResult(self.funcs[node_id](data), path_ids, self.names)
+
+    def next_batch(self, batch) -> 'BatchResult':
+        """
+        Evaluates the tree for a whole batch at once. At each decision the batch is split by the
+        predicate's mask and each part continues down its branch; each action is called once with
+        all of the rows that reach it. Predicates and actions marked with chainsmoke.chain.vectorized
+        are called with the part of the batch, all others once per row. Requires numpy.
+        :param batch: A numpy array or a mapping of column names to numpy arrays
+        :return: BatchResult with the values and the id of the action node of every row, in input order
+        """
+        import numpy
+
+        columns = isinstance(batch, Mapping)
+        if columns:
+            batch = {name: numpy.asarray(column) for name, column in batch.items()}
+            size = len(next(iter(batch.values()))) if batch else 0
+        else:
+            batch = numpy.asarray(batch)
+            size = len(batch)
+
+        def take(indexes):
+            if columns:
+                return {name: column[indexes] for name, column in batch.items()}
+
+            return batch[indexes]
+
+        def rows(part):
+            if columns:
+                return (dict(zip(part, row)) for row in zip(*part.values()))
+
+            return iter(part)
+
+        values = numpy.empty(size, dtype=object)
+        leaf_ids = numpy.empty(size, dtype=numpy.intp)
+        stack = [(0, numpy.arange(size))]
+
+        while stack:
+            node_id, indexes = stack.pop()
+            if not len(indexes):
+                continue
+
+            func = self.funcs[node_id]
+            part = take(indexes)
+
+            if self.kinds[node_id] == DECISION:
+                if is_vectorized(func):
+                    mask = numpy.asarray(func(part), dtype=bool)
+                else:
+                    mask = numpy.fromiter((bool(func(row)) for row in rows(part)), dtype=bool,
+                                          count=len(indexes))
+
+                stack.append((self.false_next[node_id], indexes[~mask]))
+                stack.append((self.true_next[node_id], indexes[mask]))
+            else:
+                if is_vectorized(func):
+                    results = func(part)
+                else:
+                    results = [func(row) for row in rows(part)]
+
+                if isinstance(results, numpy.ndarray) and results.ndim == 1:
+                    values[indexes] = results
+                else:
+                    for index, result in zip(indexes, results):
+                        values[index] = result
+
+                leaf_ids[indexes] = node_id
+
+        return BatchResult(values=values, leaf_ids=leaf_ids)
+
+    def __len__(self):
+        return len(self.names)
+
+
+BatchResult = namedtuple('BatchResult', ['values', 'leaf_ids'])
+
+
+def compile_tree(root: DecisionType, cache_size: int = None) -> CompiledTree:
+    """
+    Flattens a tree of Decision and Action objects into a CompiledTree. Nodes that appear more than
+    once in the tree are compiled once.
+    :param root: Decision or Action
+    :param cache_size: Optional maximum number of results to cache by input
+    :return: CompiledTree
+    """
+    names = []
+    kinds = array('b')
+    funcs = []
+    false_next = array('i')
+    true_next = array('i')
+    node_ids = {}
+
+    def add(node):
+        node_ids[id(node)] = len(names)
+        names.append(node.name)
+
+        if isinstance(node, Decision):
+            kinds.append(DECISION)
+            funcs.append(node.predicate)
+        else:
+            kinds.append(ACTION)
+            funcs.append(node.action)
+
+        false_next.append(-1)
+        true_next.append(-1)
+        return node_ids[id(node)]
+
+    # iterative so that deep trees do not hit the recursion limit
+    stack = [root]
+    add(root)
+
+    while stack:
+        node = stack.pop()
+
+        if not isinstance(node, Decision):
+            continue
+
+        node_id = node_ids[id(node)]
+        for children, child in ((false_next, node.false_next), (true_next, node.true_next)):
+            if id(child) not in node_ids:
+                add(child)
+                stack.append(child)
+
+            children[node_id] = node_ids[id(child)]
+
+    return CompiledTree(names, kinds, funcs, false_next, true_next, cache_size=cache_size)
+
+
+def _walk(root):
+    # yields every node once, parents before children
+    seen = set()
+    stack = [root]
+
+    while stack:
+        node = stack.pop()
+        if id(node) in seen:
+            continue
+
+        seen.add(id(node))
+        yield node
+
+        if isinstance(node, Decision):
+            stack.append(node.false_next)
+            stack.append(node.true_next)
+
+
+class LatencyHistogram(object):
+    """
+    Counts latencies in buckets whose upper bounds double from one microsecond.
+    """
+    bounds = [1e-6 * 2 ** exponent for exponent in range(25)]
+
+    def __init__(self):
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, seconds):
+        self.counts[bisect_left(self.bounds, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def percentile(self, fraction):
+        """
+        :param fraction: e.g. 0.99
+        :return: upper bound in seconds of the bucket that holds the percentile; None if empty
+        """
+        if not self.count:
+            return None
+
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= fraction * self.count:
+                return self.bounds[index] if index < len(self.bounds) else self.max
+
+    def to_dict(self):
+        return {
+            'count': self.count,
+            'mean': self.total / self.count if self.count else None,
+            'max': self.max,
+            'p50': self.percentile(0.5),
+            'p99': self.percentile(0.99),
+            'buckets': {'{bound:g}'.format(bound=bound): count
+                        for bound, count in zip(self.bounds + [float('inf')], self.counts) if count},
+        }
+
+
+class NodeProfile(object):
+    """
+    Counters and latencies for a single node.
+    """
+
+    def __init__(self):
+        self.visits = 0
+        self.true = 0
+        self.false = 0
+        self.latency = LatencyHistogram()
+
+
+class TreeProfile(object):
+    """
+    Counts visits and outcomes of every node in a tree and the latency of its predicates and actions.
+    Counts may be approximate when the tree is evaluated by several threads at once.
+    """
+
+    def __init__(self, root: DecisionType):
+        """
+        :param root: Decision or Action
+        """
+        self.root = root
+        self.nodes = {id(node): NodeProfile() for node in _walk(root)}
+
+    def call_predicate(self, node: Decision, data: Any):
+        stats = self.nodes[id(node)]
+        start = perf_counter()
+        outcome = node.predicate(data)
+        stats.latency.record(perf_counter() - start)
+
+        stats.visits += 1
+        if outcome:
+            stats.true += 1
+        else:
+            stats.false += 1
+
+        return outcome
+
+    def call_action(self, node: Action, data: Any):
+        stats = self.nodes[id(node)]
+        start = perf_counter()
+        result = node.action(data)
+        stats.latency.record(perf_counter() - start)
+        stats.visits += 1
+        return result
+
+    def snapshot(self) -> dict:
+        """
+        :return: dict with the counters and latencies of every node, in tree order
+        """
+        nodes = []
+
+        for node in _walk(self.root):
+            stats = self.nodes[id(node)]
+            node_snapshot = {
+                'name': node.name,
+                'kind': 'decision' if isinstance(node, Decision) else 'action',
+                'visits': stats.visits,
+                'latency': stats.latency.to_dict(),
+            }
+
+            if isinstance(node, Decision):
+                node_snapshot['true'] = stats.true
+                node_snapshot['false'] = stats.false
+                node_snapshot['true_next'] = node.true_next.name
+                node_snapshot['false_next'] = node.false_next.name
+
+            nodes.append(node_snapshot)
+
+        return {'nodes': nodes}
+
+    def to_json(self) -> str:
+        return json.dumps(self.snapshot())
+
+    def render(self) -> str:
+        """
+        Renders the tree with the counters of every node. The more visited branch of every decision,
+        that is the hot path, is marked with a '*'.
+        :return: string
+        """
+        lines = []
+        stack = [(self.root, 0, '')]
+
+        while stack:
+            node, depth, label = stack.pop()
+            stats = self.nodes[id(node)]
+            p50 = stats.latency.percentile(0.5)
+            line = '{indent}{label}{name} [visits={visits}'.format(indent='    ' * depth, label=label, name=node.name,
+                                                                    visits=stats.visits)
+
+            if isinstance(node, Decision):
+                line += ' true={true} false={false}'.format(true=stats.true, false=stats.false)
+            if p50 is not None:
+                line += ' p50<={p50:g}s'.format(p50=p50)
+
+            lines.append(line + ']')
+
+            if isinstance(node, Decision):
+                hot_true = stats.true >= stats.false and stats.visits
+                hot_false = stats.false > stats.true
+                stack.append((node.false_next, depth + 1, ('*' if hot_false else ' ') + 'F: '))
+                stack.append((node.true_next, depth + 1, ('*' if hot_true else ' ') + 'T: '))
+
+        return '\n'.join(lines)
+
+
+def profile_tree(root: DecisionType) -> TreeProfile:
+    """
+    Instruments every node of a tree so that Decision.next records counters and latencies.
+    :param root: Decision or Action
+    :return: TreeProfile
+    """
+    profile = TreeProfile(root)
+
+    for node in _walk(root):
+        node.profile = profile
+
+    return profile
+
+
+def unprofile_tree(root: DecisionType):
+    """
+    Removes the instrumentation added by profile_tree.
+    :param root: Decision or Action
+    """
+    for node in _walk(root):
+        node.__dict__.pop('profile', None)
+
+
+TREE_FILE_MAGIC = b'CSTREE01'
+_TREE_FILE_HEADER = struct.Struct('<8s4I')
+# tree files store 32 bit integers; the size of each array typecode depends on the platform
+_INT32_TYPECODE = next((typecode for typecode in 'ilh' if array(typecode).itemsize == 4), None)
+
+
+def _int32_array(values=()):
+    if _INT32_TYPECODE is None:
+        raise ValueError('tree files need an array typecode for 32 bit integers on this platform')
+
+    return array(_INT32_TYPECODE, values)
+
+
+class _StringTable(object):
+    """
+    A read-only sequence of strings that are decoded from a buffer only when they are asked for.
+    """
+
+    def __init__(self, blob, offsets):
+        self.blob = blob
+        self.offsets = offsets
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self)
+
+        return bytes(self.blob[self.offsets[index]:self.offsets[index + 1]]).decode('utf-8')
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+
+def dump_tree(tree, path: str, registry: Mapping):
+    """
+    Writes a tree to a compact binary file. Predicates and actions are stored by their name in the
+    registry; the structure of the tree is stored as arrays of 32 bit integers.
+    :param tree: CompiledTree, Decision or Action
+    :param path: Path of the file to write
+    :param registry: Mapping of names to every predicate and action in the tree
+    """
+    if not isinstance(tree, CompiledTree):
+        tree = compile_tree(tree)
+
+    func_names = {id(func): name for name, func in registry.items()}
+    ref_ids = {}
+    refs = []
+    node_refs = _int32_array()
+
+    for node_id in range(len(tree)):
+        func = tree.funcs[node_id]
+
+        try:
+            ref_name = func_names[id(func)]
+        except KeyError:
+            raise ValueError('{func!r} at node {name} is not in the registry'.format(func=func,
+                                                                                  name=tree.names[node_id]))
+
+        if ref_name not in ref_ids:
+            ref_ids[ref_name] = len(refs)
+            refs.append(ref_name)
+
+        node_refs.append(ref_ids[ref_name])
+
+    def string_table(strings):
+        encoded = [string.encode('utf-8') for string in strings]
+        offsets = _int32_array([0])
+        for string in encoded:
+            offsets.append(offsets[-1] + len(string))
+
+        return offsets, b''.join(encoded)
+
+    name_offsets, names_blob = string_table(tree.names[node_id] for node_id in range(len(tree)))
+    ref_offsets, refs_blob = string_table(refs)
+
+    ints = _int32_array()
+    ints.extend(_int32_array(tree.kinds))
+    ints.extend(node_refs)
+    ints.extend(_int32_array(tree.false_next))
+    ints.extend(_int32_array(tree.true_next))
+    ints.extend(name_offsets)
+    ints.extend(ref_offsets)
+
+    if sys.byteorder != 'little':
+        ints.byteswap()
+
+    with open(path, 'wb') as tree_file:
+        tree_file.write(_TREE_FILE_HEADER.pack(TREE_FILE_MAGIC, len(tree), len(refs), len(names_blob), len(refs_blob)))
+        tree_file.write(ints.tobytes())
+        tree_file.write(names_blob)
+        tree_file.write(refs_blob)
+
+
+def load_tree(path: str, registry: Mapping, cache_size: int = None) -> CompiledTree:
+    """
+    Memory-maps a file written by dump_tree and returns a CompiledTree that reads the structure of the
+    tree directly from the file. No Decision or Action objects are built and node names are only
+    decoded when a path is rendered.
+    :param path: Path of the file
+    :param registry: Mapping of names to predicates and actions
+    :param cache_size: Optional maximum number of results to cache by input
+    :return: CompiledTree
+    """
+    with open(path, 'rb') as tree_file:
+        size = os.fstat(tree_file.fileno()).st_size
+        if size < _TREE_FILE_HEADER.size:
+            raise ValueError('{path} is truncated'.format(path=path))
+
+        buffer = mmap.mmap(tree_file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    magic, node_count, ref_count, names_length, refs_length = _TREE_FILE_HEADER.unpack_from(buffer)
+    if magic != TREE_FILE_MAGIC:
+        raise ValueError('{path} is not a chainsmoke tree file'.format(path=path))
+
+    int_count = 5 * node_count + ref_count + 2
+    start = _TREE_FILE_HEADER.size
+    end = start + 4 * int_count
+
+    if size < end + names_length + refs_length:
+        raise ValueError('{path} is truncated'.format(path=path))
+
+    view = memoryview(buffer)
+    if sys.byteorder == 'little':
+        ints = view[start:end].cast(_int32_array().typecode)
+    else:
+        ints = _int32_array()
+        ints.frombytes(view[start:end])
+        ints.byteswap()
+
+    n = node_count
+    kinds = ints[0:n]
+    ref_ids = ints[n:2 * n]
+    false_next = ints[2 * n:3 * n]
+    true_next = ints[3 * n:4 * n]
+    names = _StringTable(view[end:end + names_length], ints[4 * n:5 * n + 1])
+    refs = _StringTable(view[end + names_length:end + names_length + refs_length], ints[5 * n + 1:])
+
+    resolved = [registry[refs[ref_id]] for ref_id in range(ref_count)]
+    funcs = [resolved[ref_id] for ref_id in ref_ids]
+
+    return CompiledTree(names, kinds, funcs, false_next, true_next, cache_size=cache_size)
+
+
+def _consume_exception(task):
+    # a cancelled speculative branch may already have failed; its exception is not needed
+    if not task.cancelled():
+        task.exception()
+
+
+async def _resolve_async(node: DecisionType, data: Any, speculate_depth: int):
+    path = []
+
+    while isinstance(node, Decision):
+        path.append(node.name)
+        outcome = node.predicate(data)
+
+        if isawaitable(outcome):
+            if speculate_depth <= 0:
+                outcome = await outcome
+            else:
+                # resolve both subtrees while the predicate is pending and cancel the one that loses
+                predicate_task = asyncio.ensure_future(outcome)
+                branches = {
+                    True: asyncio.ensure_future(_resolve_async(node.true_next, data, speculate_depth - 1)),
+                    False: asyncio.ensure_future(_resolve_async(node.false_next, data, speculate_depth - 1)),
+                }
+
+                try:
+                    outcome = bool(await predicate_task)
+                except BaseException:
+                    for branch in branches.values():
+                        branch.cancel()
+                        branch.add_done_callback(_consume_exception)
+                    raise
+
+                loser = branches[not outcome]
+                loser.cancel()
+                loser.add_done_callback(_consume_exception)
+
+                leaf, rest = await branches[outcome]
+                return leaf, path + rest
+
+        node = node.true_next if outcome else node.false_next
+
+    return node, path
+
+
+async def next_async(root: DecisionType, data: Any, speculate_depth: int = 0) -> Result:
+    """
+    Evaluates a tree whose predicates and actions may be coroutine functions.
+
+    With speculate_depth greater than 0, both subtrees of a decision start resolving their own
+    predicates while the decision's predicate is still pending, and the subtree that loses is
+    cancelled; subtrees speculate speculate_depth - 1 levels further. Actions are never run
+    speculatively. This trades extra predicate calls for lower latency on deep trees of I/O-bound
+    predicates.
+
+    :param root: Decision or Action
+    :param data: Any value
+    :param speculate_depth: Number of levels to speculate below each pending predicate; 0 disables speculation
+    :return: Result
+    """
+    leaf, path = await _resolve_async(root, data, speculate_depth)
+    path.append(leaf.name)
+
+    value = leaf.action(data)
+    if isawaitable(value):
+        value = await value
+
+    return Result(value=value, path=' -> '.join(path))
+
+
+RoutedBatch = namedtuple('RoutedBatch', ['leaf', 'records', 'value'])
+
+
+class Router(object):
+    """
+    Routes a stream of records through a tree and calls each leaf action once per micro-batch of
+    records instead of once per record. A leaf's buffer is flushed when it holds max_batch records or,
+    with max_wait, when its oldest record has waited max_wait seconds; whatever is left is flushed
+    when the stream ends. Actions are called with a list of records.
+    """
+
+    def __init__(self, tree: Union[DecisionType, CompiledTree], max_batch: int = 100, max_wait: float = None,
+                 clock: Callable[[], float] = monotonic):
+        """
+        :param tree: Decision, Action or CompiledTree
+        :param max_batch: Number of records that flushes a leaf's buffer
+        :param max_wait: Optional number of seconds after which a leaf's buffer is flushed
+        :param clock: Function that returns the current time in seconds
+        """
+        if max_batch < 1:
+            raise ValueError("max_batch must be at least 1; got {max_batch}".format(max_batch=max_batch))
+
+        self.tree = tree if isinstance(tree, CompiledTree) else compile_tree(tree)
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.clock = clock
+        self.buffers = {}
+        self.deadlines = {}
+
+    def add(self, record: Any) -> list:
+        """
+        Buffers a record under its leaf.
+        :param record: Any value
+        :return: List of leaf ids whose buffers are due to be flushed
+        """
+        leaf_id, _ = self.tree.resolve(record)
+
+        buffer = self.buffers.get(leaf_id)
+        if buffer is None:
+            buffer = self.buffers[leaf_id] = []
+            if self.max_wait is not None:
+                self.deadlines[leaf_id] = self.clock() + self.max_wait
+
+        buffer.append(record)
+
+        due = self.expired()
+        if len(buffer) >= self.max_batch and leaf_id not in due:
+            due.append(leaf_id)
+
+        return due
+
+    def expired(self) -> list:
+        """
+        :return: List of leaf ids whose oldest record has waited at least max_wait seconds
+        """
+        if not self.deadlines:
+            return []
+
+        now = self.clock()
+        return [leaf_id for leaf_id, deadline in self.deadlines.items() if deadline <= now]
+
+    def take(self, leaf_id: int):
+        """
+        Removes a leaf's buffer.
+        :param leaf_id: Id of the leaf in the compiled tree
+        :return: Tuple of the leaf's name and its buffered records
+        """
+        self.deadlines.pop(leaf_id, None)
+        return self.tree.names[leaf_id], self.buffers.pop(leaf_id)
+
+    def flush(self, leaf_id: int) -> RoutedBatch:
+        """
+        Calls a leaf's action with its buffered records.
+        :param leaf_id: Id of the leaf in the compiled tree
+        :return: RoutedBatch
+        """
+        name, records = self.take(leaf_id)
+        return RoutedBatch(leaf=name, records=records, value=self.tree.funcs[leaf_id](records))
+
+    def route(self, records) -> 'Iterator[RoutedBatch]':
+        """
+        Routes an iterable of records. max_wait is checked as records arrive.
+        :param records: An iterable
+        :return: Generator of RoutedBatch in the order the batches were flushed
+        """
+        for record in records:
+            for leaf_id in self.add(record):
+                yield self.flush(leaf_id)
+
+        for leaf_id in list(self.buffers):
+            yield self.flush(leaf_id)
+
+    async def _flush_async(self, leaf_id: int) -> RoutedBatch:
+        name, records = self.take(leaf_id)
+
+        value = self.tree.funcs[leaf_id](records)
+        if isawaitable(value):
+            value = await value
+
+        return RoutedBatch(leaf=name, records=records, value=value)
+
+    async def route_async(self, records) -> 'AsyncIterator[RoutedBatch]':
+        """
+        Routes an async iterable of records. Buffers are flushed when max_wait passes even while the
+        stream is idle, and actions may be coroutine functions.
+        :param records: An async iterable
+        :return: Async generator of RoutedBatch in the order the batches were flushed
+        """
+        iterator = records.__aiter__()
+        pending = None
+
+        try:
+            while True:
+                if pending is None:
+                    pending = asyncio.ensure_future(iterator.__anext__())
+
+                timeout = None
+                if self.deadlines:
+                    timeout = max(min(self.deadlines.values()) - self.clock(), 0)
+
+                # the pending read is kept across timeouts so the stream is never interrupted
+                done, _ = await asyncio.wait((pending,), timeout=timeout)
+
+                if done:
+                    try:
+                        record = pending.result()
+                    except StopAsyncIteration:
+                        pending = None
+                        break
+
+                    pending = None
+                    due = self.add(record)
+                else:
+                    due = self.expired()
+
+                for leaf_id in due:
+                    yield await self._flush_async(leaf_id)
+        finally:
+            if pending is not None:
+                pending.cancel()
+                pending.add_done_callback(_consume_exception)
+
+        for leaf_id in list(self.buffers):
+            yield await self._flush_async(leaf_id)
@@ -17,11 +17,13 @@ CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFT
 OTHER DEALINGS IN THE SOFTWARE.
 """
 from functools import partial
+from collections import OrderedDict, namedtuple
 from typing import Callable
 import inspect
+import threading
 import time
 
-from chainsmoke._utils import get_num_positional_args
+from chainsmoke._utils import get_num_positional_args, FunctionWrapper
 from chainsmoke.validate import validate_it
 
 
@@ -114,6 +116,11 @@ def retry(num_retries: int=3, pause: int=5, case: tuple=(Exception,)) -> Callabl
 
         return retry_inner
 
+    # kept so that combine can fuse the retries into a single wrapper
+    retry_decorator.num_retries = num_retries
+    retry_decorator.pause = pause
+    retry_decorator.case = case
+
     return retry_decorator
 
 
@@ -132,3 +139,119 @@ def curry(func):
             return func(*args, **kwargs)
 
     return curry_inner
+
+
+CacheStats = namedtuple('CacheStats', ['hits', 'misses', 'unhashable', 'size'])
+
+_kwargs_mark = object()
+
+
+class Memoized(FunctionWrapper):
+    """
+    A function whose results are kept in a bounded cache keyed by its arguments.
+    """
+
+    def __init__(self, func, maxsize=128, ttl=None, clock=time.monotonic, typed=False):
+        """
+        :param func: Any callable; should be pure
+        :param maxsize: Maximum number of cached results; the least recently used result is evicted first.
+                        None means the cache is unbounded.
+        :param ttl: Optional number of seconds after which a cached result expires
+        :param clock: Function that returns the current time in seconds
+        :param typed: If True arguments of different types, such as 1, 1.0 and True, are cached separately
+        """
+        super().__init__(func)
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.clock = clock
+        self.typed = typed
+        self._reset()
+
+    def _reset(self):
+        self.cache = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.unhashable = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, *args, **kwargs):
+        key = args
+
+        if kwargs:
+            key += (_kwargs_mark,) + tuple(sorted(kwargs.items()))
+
+        if self.typed:
+            key += tuple(type(arg) for arg in args)
+            if kwargs:
+                key += tuple(type(value) for _, value in sorted(kwargs.items()))
+
+        try:
+            with self._lock:
+                entry = self.cache.get(key)
+
+                if entry is not None:
+                    result, expires = entry
+
+                    if expires is None or expires > self.clock():
+                        self.cache.move_to_end(key)
+                        self.hits += 1
+                        return result
+
+                    del self.cache[key]
+
+                self.misses += 1
+        except TypeError:
+            # unhashable arguments can not be cached so the function is simply called
+            self.unhashable += 1
+            return self.func(*args, **kwargs)
+
+        result = self.func(*args, **kwargs)
+        expires = self.clock() + self.ttl if self.ttl is not None else None
+
+        with self._lock:
+            self.cache[key] = (result, expires)
+
+            if self.maxsize is not None and len(self.cache) > self.maxsize:
+                self.cache.popitem(last=False)
+
+        return result
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        for name in ('cache', 'hits', 'misses', 'unhashable', '_lock'):
+            del state[name]
+
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._reset()
+
+    def stats(self):
+        """
+        :return: CacheStats with the number of hits, misses, calls with unhashable arguments and cached results
+        """
+        return CacheStats(hits=self.hits, misses=self.misses, unhashable=self.unhashable, size=len(self.cache))
+
+    def clear(self):
+        """
+        Empties the cache and resets the stats.
+        """
+        self._reset()
+
+
+def memoize(maxsize=128, ttl=None, typed=False):
+    """
+    Caches the results of a pure function, e.g. an expensive stage in a chain. Calls with
+    unhashable arguments are not cached.
+    :param maxsize: Maximum number of cached results; defaults to 128. The least recently used
+                    result is evicted first; None means the cache is unbounded.
+    :param ttl: Optional number of seconds after which a cached result expires
+    :param typed: If True arguments of different types, such as 1, 1.0 and True, are cached separately
+    :return: a decorator that returns a Memoized function
+    """
+
+    def memoize_decorator(func):
+        return Memoized(func, maxsize=maxsize, ttl=ttl, typed=typed)
+
+    return memoize_decorator
@@ -17,6 +17,46 @@ CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFT
 OTHER DEALINGS IN THE SOFTWARE.
 """
 
+from chainsmoke._utils import FunctionWrapper
+
+DEFAULT_INPUT_STRING = "{func_name} called with args: {args} and kwargs {kwargs}"
+DEFAULT_OUTPUT_STRING = "{func_name} returned result {result}"
+UNKNOWN_FUNCTION_NAME = 'unknown function name; probably a lambda or partially applied function...'
+
+
+class Logged(FunctionWrapper):
+    """
+    A function wrapped in a logger.
+    """
+
+    def __init__(self, function, logger, input_string, output_string, name=None):
+        """
+        :param function: function to be logged
+        :param logger: Function that takes a string
+        :param input_string: interpolated string for logging the input
+        :param output_string: interpolated string for logging the output
+        :param name: An optional name to log instead of the name of the function
+        """
+        super().__init__(function)
+        self.logger = logger
+        self.input_string = input_string
+        self.output_string = output_string
+
+        if not name:
+            try:
+                name = function.__name__
+            except AttributeError:
+                name = UNKNOWN_FUNCTION_NAME
+
+        self.function_name = name
+
+    def __call__(self, *args, **kwargs):
+        self.logger(self.input_string.format(func_name=self.function_name, args=args, kwargs=kwargs))
+        result = self.func(*args, **kwargs)
+        self.logger(self.output_string.format(func_name=self.function_name, result=result))
+        return result
+
+
 def log_it(logger=print, input_string=None, output_string=None):
     """
     Wraps a function in a logger.
@@ -27,34 +67,15 @@ def log_it(logger=print, input_string=None, output_string=None):
     :param output_string: An optional interpolated stirng for logging the output; needs to have {func_name} and
                           {result} in the string.
     """
-    def log_it_decorator(function, __name=None):
-        def inner(*args, **kwargs):
-            if input_string:
-                input_log_string = input_string
-            else:
-                input_log_string = "{func_name} called with args: {args} and kwargs {kwargs}"
-
-            if output_string:
-                output_log_string = output_string
-            else:
-                output_log_string = "{func_name} returned result {result}"
-
-            if not __name:
-                try:
-                    function_name = function.__name__
-                except AttributeError:
-                    function_name = 'unknown function name; probably a lambda or partially applied function...'
+    input_string = input_string or DEFAULT_INPUT_STRING
+    output_string = output_string or DEFAULT_OUTPUT_STRING
 
-            else:
-                function_name = __name
-
-            logger(input_log_string.format(func_name=function_name, args=args, kwargs=kwargs))
-            result = function(*args, **kwargs)
-            logger(output_log_string.format(func_name=function_name, result=result))
-            return result
+    def log_it_decorator(function, __name=None):
+        return Logged(function, logger, input_string, output_string, name=__name)
 
-        return inner
+    # kept so that combine can fuse the logging into a single wrapper
+    log_it_decorator.logger = logger
+    log_it_decorator.input_string = input_string
+    log_it_decorator.output_string = output_string
 
     return log_it_decorator
-
-
@@ -19,6 +19,11 @@ OTHER DEALINGS IN THE SOFTWARE.
 """
 
 import inspect
+import json
+from time import perf_counter
+
+from chainsmoke._utils import FunctionWrapper, is_vectorized
+from chainsmoke.decide import LatencyHistogram
 
 
 class ChainsmokePatternMatchError(Exception):
@@ -29,38 +34,438 @@ class _Otherwise:
     """
     The default pattern.
     """
-    pass
+
+    def __repr__(self):
+        return 'otherwise'
 
 
 otherwise = _Otherwise()
 
 
-def __convert_if_list(pattern):
-    if isinstance(pattern, list):
-        key = 'list-' + str(hash(tuple(pattern)))
-    else:
-        key = pattern
+class Guard(object):
+    """
+    A pattern that matches when its predicate returns True for the argument.
+    """
+
+    def __init__(self, predicate):
+        """
+        :param predicate: A 1-arity function that returns a boolean
+        """
+        self.predicate = predicate
+
+    def __repr__(self):
+        return 'guard({predicate!r})'.format(predicate=self.predicate)
+
+
+def guard(predicate) -> Guard:
+    """
+    Makes a pattern from a predicate.
+    :param predicate: A 1-arity function that returns a boolean
+    :return: Guard
+    """
+    return Guard(predicate)
+
+
+_LIST = object()
+_DICT = object()
+
+
+class Frozen(object):
+    """
+    An immutable structure whose canonical key is computed once and then reused, both when it is
+    matched and when it is nested in other structures.
+    """
+    __slots__ = ('value', '_key')
+
+    def __init__(self, value):
+        """
+        :param value: A structure of lists, dicts, sets and tuples that won't be mutated
+        """
+        self.value = value
+        self._key = None
+
+    @property
+    def key(self):
+        if self._key is None:
+            self._key = canonical_key(self.value)
+        return self._key
+
+    def __hash__(self):
+        return hash(self.key)
+
+    def __eq__(self, other):
+        # equal to another Frozen with the same key, or to the key itself as found in a pattern table
+        if isinstance(other, Frozen):
+            return self.key == other.key
+        return self.key == other
+
+    def __repr__(self):
+        return 'freeze({value!r})'.format(value=self.value)
+
+
+def freeze(value) -> Frozen:
+    """
+    Marks a structure as immutable so that its canonical key is only computed once.
+    :param value: A structure of lists, dicts, sets and tuples
+    :return: Frozen
+    """
+    return Frozen(value)
+
+
+def canonical_key(value):
+    """
+    Builds a hashable key for a value; equal lists, dicts and sets get equal keys, lists and dicts get
+    keys that differ from any tuple, and the key of a hashable value is equal to the value so that
+    hashable arguments can be looked up without building their key.
+    :param value: Any value
+    :return: A hashable key
+    :raises TypeError: if the value contains an unhashable object that isn't a list, dict or set
+    """
+    if isinstance(value, Frozen):
+        return value.key
+
+    if isinstance(value, tuple):
+        return tuple(map(canonical_key, value))
+
+    if isinstance(value, list):
+        return _LIST, tuple(map(canonical_key, value))
+
+    if isinstance(value, dict):
+        return _DICT, frozenset((key, canonical_key(item)) for key, item in value.items())
+
+    if isinstance(value, (set, frozenset)):
+        return frozenset(map(canonical_key, value))
+
+    hash(value)
+    return value
+
+
+class _Node(object):
+    """
+    A node of the discrimination tree; each level of the tree discriminates on one argument.
+    """
+    __slots__ = ('literals', 'types', 'type_cache', 'guards', 'wildcard', 'func')
+
+    def __init__(self):
+        self.literals = {}
+        # (type, node) pairs kept with subclasses ahead of their bases
+        self.types = []
+        # argument type -> the type children that match it, resolved once per type
+        self.type_cache = {}
+        self.guards = {}
+        self.wildcard = None
+        self.func = None
+
+    def child(self, pattern) -> '_Node':
+        """
+        Finds or adds the child for a pattern.
+        :param pattern: otherwise, a type, a Guard or a literal value
+        :return: _Node
+        """
+        if pattern is otherwise:
+            if self.wildcard is None:
+                self.wildcard = _Node()
+            return self.wildcard
+
+        if isinstance(pattern, type):
+            self.type_cache.clear()
+
+            for index, (cls, node) in enumerate(self.types):
+                if cls is pattern:
+                    return node
+                if issubclass(pattern, cls):
+                    self.types.insert(index, (pattern, _Node()))
+                    return self.types[index][1]
+
+            self.types.append((pattern, _Node()))
+            return self.types[-1][1]
+
+        if isinstance(pattern, Guard):
+            return self.guards.setdefault(pattern, _Node())
+
+        return self.literals.setdefault(canonical_key(pattern), _Node())
+
+    def resolve_types(self, cls) -> tuple:
+        """
+        Finds the type children that match a type, ordered like functools.singledispatch: by the
+        position of their type in the MRO, followed by virtual bases such as registered ABCs.
+        :param cls: The type of an argument
+        :return: tuple of _Node
+        """
+        mro = cls.__mro__
+        matching = [(pattern, node) for pattern, node in self.types if issubclass(cls, pattern)]
+        matching.sort(key=lambda item: mro.index(item[0]) if item[0] in mro else len(mro))
+        return tuple(node for _, node in matching)
+
+    def candidates(self, arg):
+        """
+        Yields the children that match an argument, most specific first: literal values, then types,
+        then guards and finally the wildcard.
+        """
+        try:
+            literal = self.literals.get(arg)
+        except TypeError:
+            try:
+                literal = self.literals.get(canonical_key(arg))
+            except TypeError:
+                # an argument without a canonical key can't equal a literal pattern
+                literal = None
+
+        if literal is not None:
+            yield literal
+
+        if self.types:
+            cls = type(arg)
+            nodes = self.type_cache.get(cls)
+            if nodes is None:
+                nodes = self.type_cache[cls] = self.resolve_types(cls)
+
+            yield from nodes
+
+        for pattern, node in self.guards.items():
+            if pattern.predicate(arg):
+                yield node
+
+        if self.wildcard is not None:
+            yield self.wildcard
+
+
+def _find(node: _Node, args: tuple, index: int):
+    if index == len(args):
+        return node.func
+
+    for child in node.candidates(args[index]):
+        func = _find(child, args, index + 1)
+        if func is not None:
+            return func
 
-    return key
+    return None
+
+
+class PatternStats(object):
+    """
+    Counters and latencies for the handler of a single pattern.
+    """
+
+    def __init__(self, patterns, handler):
+        self.patterns = patterns
+        self.handler = getattr(handler, '__name__', repr(handler))
+        self.calls = 0
+        self.latency = LatencyHistogram()
+
+
+class Timed(FunctionWrapper):
+    """
+    A handler that records its calls and latencies in a PatternStats; a vectorized handler counts one
+    call per element of the batch and one latency per batch.
+    """
+
+    def __init__(self, func, stats: PatternStats):
+        super().__init__(func)
+        self.stats = stats
+        self.batched = is_vectorized(func)
+        if self.batched:
+            self.vectorized = True
+
+    def __call__(self, *args):
+        start = perf_counter()
+        result = self.func(*args)
+        self.stats.latency.record(perf_counter() - start)
+        self.stats.calls += len(args[0]) if self.batched and args else 1
+        return result
+
+
+def _pattern_name(pattern):
+    return pattern.__name__ if isinstance(pattern, type) else repr(pattern)
+
+
+class MatchStats(object):
+    """
+    Counts the calls and latencies of the handler of every pattern of a Match, including how often the
+    all-otherwise fallback is hit. Counts may be approximate when several threads dispatch at once.
+    """
+
+    def __init__(self):
+        # canonical key of the patterns -> PatternStats, in order of registration
+        self.patterns = {}
+
+    def wrap(self, key, patterns, func) -> Timed:
+        stats = self.patterns[key] = PatternStats(patterns, func)
+        return Timed(func, stats)
+
+    def snapshot(self) -> dict:
+        """
+        :return: dict with the counters and latencies of every pattern and the share of calls that fell
+                 back to an all-otherwise pattern
+        """
+        patterns = []
+        calls = fallback_calls = 0
+
+        for stats in self.patterns.values():
+            fallback = all(pattern is otherwise for pattern in stats.patterns)
+            calls += stats.calls
+            if fallback:
+                fallback_calls += stats.calls
+
+            patterns.append({
+                'pattern': ', '.join(map(_pattern_name, stats.patterns)),
+                'handler': stats.handler,
+                'fallback': fallback,
+                'calls': stats.calls,
+                'latency': stats.latency.to_dict(),
+            })
+
+        return {
+            'calls': calls,
+            'fallback_calls': fallback_calls,
+            'fallback_rate': fallback_calls / calls if calls else None,
+            'patterns': patterns,
+        }
+
+    def to_json(self) -> str:
+        return json.dumps(self.snapshot())
 
 
 class Match:
     def __init__(self):
         self.funcs = {}
+        # canonical key -> the patterns as they were registered
+        self.patterns = {}
+        # set by enable_stats
+        self.stats = None
+        # one discrimination tree per number of arguments
+        self.roots = {}
+        # numbers of arguments that have an all-otherwise pattern
+        self.exhaustive = set()
+        # numbers of arguments that have a literal or guard pattern; the others dispatch on types alone
+        self.value_patterns = set()
+        # tuple of argument types -> function, for trees that dispatch on types alone
+        self.dispatch_cache = {}
 
     def find_func(self, params):
         """
-        Finds the function given the patterns
-        :param params:
-        :return:
+        Finds the function given the patterns; a literal value is more specific than a type, a type
+        more specific than its bases, a type more specific than a guard and a guard more specific
+        than otherwise. Earlier arguments are more significant than later ones.
+        :param params: Tuple of arguments
+        :return: Callable, or None if no pattern matches
+        """
+        root = self.roots.get(len(params))
+        if root is None:
+            return None
+
+        if len(params) in self.value_patterns:
+            return _find(root, params, 0)
+
+        types = tuple(map(type, params))
+        try:
+            return self.dispatch_cache[types]
+        except KeyError:
+            func = self.dispatch_cache[types] = _find(root, params, 0)
+            return func
+
+    def dispatch_many(self, calls) -> list:
+        """
+        Calls the matched function for each tuple of arguments. The calls are grouped by matched function;
+        a function marked with vectorized is called once per group with a list per argument and must
+        return a list of results, any other function is called once per tuple of arguments.
+        :param calls: An iterable of argument tuples
+        :return: List of results in the order of the calls
+        """
+        groups = {}
+
+        for index, args in enumerate(calls):
+            func = self.find_func(args)
+            if func is None:
+                raise ChainsmokePatternMatchError("No pattern matches the arguments {args}".format(args=args))
+
+            group = groups.get(func)
+            if group is None:
+                group = groups[func] = ([], [])
+
+            group[0].append(index)
+            group[1].append(args)
+
+        results = [None] * sum(len(indexes) for indexes, _ in groups.values())
+
+        for func, (indexes, rows) in groups.items():
+            if is_vectorized(func):
+                values = func(*map(list, zip(*rows)))
+                if len(values) != len(rows):
+                    raise ValueError(
+                        "{func_name} returned {count} results for {size} calls".format(
+                            func_name=getattr(func, '__name__', func), count=len(values), size=len(rows)))
+            else:
+                values = [func(*args) for args in rows]
+
+            for index, value in zip(indexes, values):
+                results[index] = value
+
+        return results
+
+    def register(self, patterns, func):
+        """
+        Adds the patterns to the discrimination tree.
+        :param patterns: Tuple of patterns
+        :param func: Function called when the patterns match
         """
-        match = self.funcs.get(params, self.funcs[(otherwise,)])
-        return match
+        key = canonical_key(patterns)
+        self.funcs[key] = func
+        self.patterns[key] = patterns
+        self._index(key, patterns, func)
+
+    def _index(self, key, patterns, func):
+        if self.stats is not None:
+            func = self.stats.wrap(key, patterns, func)
+
+        node = self.roots.get(len(patterns))
+        if node is None:
+            node = self.roots[len(patterns)] = _Node()
+
+        for pattern in patterns:
+            node = node.child(pattern)
+
+        node.func = func
+        self.dispatch_cache.clear()
+
+        if any(pattern is not otherwise and not isinstance(pattern, type) for pattern in patterns):
+            self.value_patterns.add(len(patterns))
+
+        if all(pattern is otherwise for pattern in patterns):
+            self.exhaustive.add(len(patterns))
+
+    def _rebuild(self):
+        self.roots = {}
+        self.exhaustive = set()
+        self.value_patterns = set()
+        self.dispatch_cache.clear()
+
+        for key, func in self.funcs.items():
+            self._index(key, self.patterns[key], func)
+
+    def enable_stats(self) -> MatchStats:
+        """
+        Rebuilds the index with handlers that record their calls and latencies; without stats the
+        handlers are called directly.
+        :return: MatchStats
+        """
+        self.stats = MatchStats()
+        self._rebuild()
+        return self.stats
+
+    def disable_stats(self):
+        """
+        Rebuilds the index with the original handlers.
+        """
+        self.stats = None
+        self._rebuild()
 
     def __call__(self, *patterns):
         """
         Takes the patterns that are passed into the decorator and stores the associated
-        function in the function repository.
+        function in the function repository. Each pattern is otherwise, a type that matches its
+        instances, a guard or a value that matches arguments equal to it; lists, dicts and sets
+        are compared by their contents.
         :param patterns: The patterns to be matched against
         :return: Callable
         """
@@ -75,21 +480,35 @@ class Match:
                 raise ChainsmokePatternMatchError(
                     "Number of patterns needs to equal number of args in {func_name}".format(func_name=func_name))
 
-            self.funcs[patterns] = func
+            self.register(patterns, func)
 
             # define a function that gives a result from the matched function
             def inner(*inner_args):
-                if not self.funcs.get((otherwise,)):
+                if len(inner_args) not in self.exhaustive:
                     raise ChainsmokePatternMatchError(
                         "Incomplete pattern match for {func_name}; try adding an 'otherwise' case".format(
                             func_name=func_name))
 
                 matched_function = self.find_func(inner_args)
-                return matched_function(*inner_args)
 
-            return inner
+                # a vectorized handler only takes batches, so call it with a batch of one
+                if is_vectorized(matched_function):
+                    return matched_function(*([arg] for arg in inner_args))[0]
 
-        return decorator
+                return matched_function(*inner_args)
+
+            def map_inner(*iterables):
+                """
+                Like map(inner, *iterables) but grouped by matched function; see Match.dispatch_many.
+                """
+                if len(iterables) not in self.exhaustive:
+                    raise ChainsmokePatternMatchError(
+                        "Incomplete pattern match for {func_name}; try adding an 'otherwise' case".format(
+                            func_name=func_name))
 
+                return self.dispatch_many(zip(*iterables))
 
+            inner.map = map_inner
+            return inner
 
+        return decorator
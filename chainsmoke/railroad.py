@@ -16,6 +16,7 @@ THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABI
 CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
 OTHER DEALINGS IN THE SOFTWARE.
 """
+from chainsmoke._utils import FunctionWrapper
 
 
 class Either(object):
@@ -58,6 +59,70 @@ class Nothing(object):
     pass
 
 
+class EitherRailroad(FunctionWrapper):
+    """
+    A function that takes and returns an Either.
+    """
+
+    def __init__(self, func, debug=False):
+        """
+        :param func: A 1-arity function
+        :param debug: If True exceptions are raised instead of being returned as an Error
+        """
+        super().__init__(func)
+        self.debug = debug
+
+    def __call__(self, *args):
+        # on a method the instance is bound ahead of the either
+        *bound, either = args
+        if isinstance(either, Error):
+            return Error(either.value)
+        else:
+            if not isinstance(either, Good):
+                value = either
+            else:
+                value = either.value
+            try:
+                return Good(self.func(*bound, value))
+            except Exception as e:
+                if self.debug:
+                    self.func(*bound, value)
+                else:
+                    return Error(e)
+
+
+class MaybeRailroad(FunctionWrapper):
+    """
+    A function that takes and returns a Maybe.
+    """
+
+    def __init__(self, func, debug=False):
+        """
+        :param func: A 1-arity function
+        :param debug: If True exceptions are raised instead of being returned as Nothing
+        """
+        super().__init__(func)
+        self.debug = debug
+
+    def __call__(self, *args):
+        # on a method the instance is bound ahead of the maybe
+        *bound, maybe = args
+        if isinstance(maybe, Nothing):
+            return Nothing()
+        else:
+            if not isinstance(maybe, Just):
+                value = maybe
+            else:
+                value = maybe.value
+            try:
+                return Just(self.func(*bound, value))
+            except Exception:
+                if self.debug:
+                    self.func(*bound, value)
+                else:
+                    return Nothing()
+
+
 def railroad_it(railroad_type, debug=False):
     """
     Creates a railroad-able function; that is a function in which the error handling is abstracted into
@@ -69,46 +134,14 @@ def railroad_it(railroad_type, debug=False):
     if railroad_type != Maybe and railroad_type != Either:
         raise TypeError('{type} is not a valid railroad type; try Either or Maybe.'.format(type=railroad_type.__name__))
 
-    def decorator(func):
-
+    def railroad_it_decorator(func):
         if railroad_type == Either:
-            def check_type_of_either(either):
-                if isinstance(either, Error):
-                    return Error(either.value)
-                else:
-                    if not isinstance(either, Good):
-                        value = either
-                    else:
-                        value = either.value
-                    try:
-                        return Good(func(value))
-                    except Exception as e:
-                        if debug:
-                            func(value)
-                        else:
-                            return Error(e)
-
-            result = check_type_of_either
-
+            return EitherRailroad(func, debug=debug)
         else:
-            def check_type_of_maybe(maybe):
-                if isinstance(maybe, Nothing):
-                    return Nothing()
-                else:
-                    if not isinstance(maybe, Just):
-                        value = maybe
-                    else:
-                        value = maybe.value
-                    try:
-                        return Just(func(value))
-                    except Exception:
-                        if debug:
-                            func(value)
-                        else:
-                            return Nothing()
-
-            result = check_type_of_maybe
-
-        return result
-
-    return decorator
+            return MaybeRailroad(func, debug=debug)
+
+    # kept so that combine can fuse the railroad into a single wrapper
+    railroad_it_decorator.railroad_type = railroad_type
+    railroad_it_decorator.debug = debug
+
+    return railroad_it_decorator
@@ -0,0 +1,135 @@
+"""
+Spans and exporters for tracing chains of functions.
+
+
+Copyright (C) 2016  Alex Hendrie Bielen
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and
+to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+The above copyright notice and this permission notice shall be included in all copies or
+substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED
+TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF
+CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+OTHER DEALINGS IN THE SOFTWARE.
+"""
+from itertools import count
+import json
+import threading
+import time
+
+_span_ids = count(1)
+
+
+class Span(object):
+    """
+    Records the name, start time, duration and exception of a single call.
+    """
+
+    def __init__(self, name, parent=None):
+        """
+        :param name: Name of the span
+        :param parent: An optional parent Span
+        """
+        self.name = name
+        self.parent = parent
+        self.span_id = next(_span_ids)
+        self.trace_id = parent.trace_id if parent else self.span_id
+        self.children = []
+        self.start = time.time()
+        self.duration = None
+        self.exception = None
+        self._started = time.perf_counter()
+
+        if parent:
+            parent.children.append(self)
+
+    def finish(self, exception=None):
+        """
+        :param exception: An optional exception raised during the span
+        """
+        self.duration = time.perf_counter() - self._started
+
+        if exception is not None:
+            self.exception = repr(exception)
+
+    def walk(self):
+        """
+        :return: generator of this span and all of its descendants, parents first
+        """
+        yield self
+
+        for child in self.children:
+            yield from child.walk()
+
+    def to_dict(self):
+        return {
+            'trace_id': self.trace_id,
+            'span_id': self.span_id,
+            'parent_id': self.parent.span_id if self.parent else None,
+            'name': self.name,
+            'start': self.start,
+            'duration': self.duration,
+            'exception': self.exception,
+        }
+
+
+class Tracer(object):
+    """
+    Creates spans and passes every finished root span to an exporter.
+    """
+
+    def __init__(self, exporter):
+        """
+        :param exporter: Any object with an export method that takes a root Span
+        """
+        self.exporter = exporter
+
+    def start_span(self, name, parent=None):
+        return Span(name, parent=parent)
+
+    def finish_span(self, span, exception=None):
+        span.finish(exception)
+
+        if span.parent is None:
+            self.exporter.export(span)
+
+
+class MemoryExporter(object):
+    """
+    Keeps finished root spans in a list.
+    """
+
+    def __init__(self):
+        self.spans = []
+
+    def export(self, span):
+        self.spans.append(span)
+
+
+class JsonLinesExporter(object):
+    """
+    Appends every span of a finished trace to a file as one JSON object per line.
+    """
+
+    def __init__(self, path):
+        """
+        :param path: Path of the file to append to
+        """
+        self.path = path
+        self._file = open(path, 'a')
+        self._lock = threading.Lock()
+
+    def export(self, span):
+        lines = ''.join(json.dumps(child.to_dict()) + '\n' for child in span.walk())
+
+        with self._lock:
+            self._file.write(lines)
+            self._file.flush()
+
+    def close(self):
+        self._file.close()
@@ -21,76 +21,111 @@ OTHER DEALINGS IN THE SOFTWARE.
 import inspect
 import typing
 
+from chainsmoke._utils import FunctionWrapper
+
 
 class ChainSmokeValidationError(Exception):
     pass
 
 
-def validate_it(func):
+class Validated(FunctionWrapper):
     """
-    Validate that the parameters have the correct types according to the type annotations.
-
-    :param func: function to be decorated
-    :param __meta: the original meta data about the original function; only used by the integration module
-    :return: decorated function
+    A function whose arguments and return value are checked against its type annotations.
     """
-    types = func.__annotations__
-    func_name = func.__name__
-
-    # since varnames is read-only we sometimes have to use a different attribute
-    try:
-        param_names = func.overridden_varnames
-    except AttributeError:
-        args_spec = inspect.getargs(func.__code__)
-        param_names = args_spec.args
-
-    def validate_inner(*args, **kwargs):
-        if not types:
-            raise ChainSmokeValidationError("{func_name} does not have type annotations".format(func_name=func_name))
-
-        if not kwargs and len(args) != len(param_names):
-            raise ChainSmokeValidationError(
-                "{func_name} cannot be properly validated by Chainsmoke. "
-                "This is likely because it is using a default keyword argument".format(func_name=func_name))
-
-        if not kwargs:
-            names_and_values = zip(param_names, args)
-        else:
-            keyword_args = []
-            for name in param_names:
-                val = kwargs.get(name)
-                if val:
-                    keyword_args.append(val)
-
-            names_and_values = zip(param_names, args + tuple(keyword_args))
-
-        for name, value in names_and_values:
-            t = types[name]
-
-            if not isinstance(value, t):
-                bad_type = type(value)
-                error_string = "{func_name} expects type {expected_type} for arg {arg_name} " \
-                               "but received value {value} with type of {value_type}"
-                error_string = error_string.format(func_name=func_name,
-                                                   expected_type=t,
-                                                   arg_name=name,
-                                                   value=value,
-                                                   value_type=bad_type)
-                raise TypeError(error_string)
+
+    def __init__(self, func):
+        """
+        :param func: function to be validated
+        """
+        super().__init__(func)
+        self.types = func.__annotations__
+        self.func_name = func.__name__
+
+        # since varnames is read-only we sometimes have to use a different attribute
+        try:
+            self.param_names = func.overridden_varnames
+        except AttributeError:
+            args_spec = inspect.getargs(func.__code__)
+            self.param_names = args_spec.args
+
+    def __call__(self, *args, **kwargs):
+        check_args(self.func_name, self.types, self.param_names, args, kwargs)
 
         # check the type of the return as well
-        return_type = types['return']
-        result = func(*args, **kwargs)
+        return_type = self.types['return']
+        result = self.func(*args, **kwargs)
+        check_return(self.func_name, return_type, result)
 
-        if not isinstance(result, return_type):
-            bad_return_type = type(result)
-            error_string = "{func_name} has return type {expected_type} but is returning value {value} of type {value_type}"
+        return result
+
+
+def check_args(func_name, types, param_names, args, kwargs):
+    """
+    Raises an exception if the arguments do not have the types in the type annotations.
+    :param func_name: name of the function being validated
+    :param types: the type annotations of the function
+    :param param_names: names of the positional parameters of the function
+    :param args: positional arguments
+    :param kwargs: keyword arguments
+    """
+    if not types:
+        raise ChainSmokeValidationError("{func_name} does not have type annotations".format(func_name=func_name))
+
+    if not kwargs and len(args) != len(param_names):
+        raise ChainSmokeValidationError(
+            "{func_name} cannot be properly validated by Chainsmoke. "
+            "This is likely because it is using a default keyword argument".format(func_name=func_name))
+
+    if not kwargs:
+        names_and_values = zip(param_names, args)
+    else:
+        keyword_args = []
+        for name in param_names:
+            val = kwargs.get(name)
+            if val:
+                keyword_args.append(val)
+
+        names_and_values = zip(param_names, args + tuple(keyword_args))
+
+    for name, value in names_and_values:
+        # parameters without annotations, such as self on a method, are not checked
+        t = types.get(name)
+
+        if t is not None and not isinstance(value, t):
+            bad_type = type(value)
+            error_string = "{func_name} expects type {expected_type} for arg {arg_name} " \
+                           "but received value {value} with type of {value_type}"
             error_string = error_string.format(func_name=func_name,
-                                               expected_type=return_type,
-                                               value=result,
-                                               value_type=bad_return_type)
+                                               expected_type=t,
+                                               arg_name=name,
+                                               value=value,
+                                               value_type=bad_type)
             raise TypeError(error_string)
 
-        return result
 
-    return validate_inner
+def check_return(func_name, return_type, result):
+    """
+    Raises an exception if the result does not have the return type in the type annotations.
+    :param func_name: name of the function being validated
+    :param return_type: the annotated return type of the function
+    :param result: value returned by the function
+    """
+    if not isinstance(result, return_type):
+        bad_return_type = type(result)
+        error_string = "{func_name} has return type {expected_type} but is returning value {value} of type {value_type}"
+        error_string = error_string.format(func_name=func_name,
+                                           expected_type=return_type,
+                                           value=result,
+                                           value_type=bad_return_type)
+        raise TypeError(error_string)
+
+
+def validate_it(func):
+    """
+    Validate that the parameters have the correct types according to the type annotations.
+
+    :param func: function to be decorated
+    :param __meta: the original meta data about the original function; only used by the integration module
+    :return: decorated function
+    """
+    return Validated(func)
@@ -0,0 +1,52 @@
+"""
+Unit tests for bench.py
+
+Copyright (C) 2016  Alex Hendrie Bielen
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and
+to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+The above copyright notice and this permission notice shall be included in all copies or
+substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED
+TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF
+CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+OTHER DEALINGS IN THE SOFTWARE.
+"""
+import json
+
+from chainsmoke.bench import run_benchmarks, compare, main
+
+
+def test_that_run_benchmarks_covers_every_primitive_at_each_depth_and_size():
+    results = run_benchmarks(depths=[1, 2], sizes=[3], repeat=1, min_time=0)
+
+    assert 'micro.combine.depth=2' in results
+    assert 'micro.decision.next.depth=1' in results
+    assert 'macro.compose.size=3' in results
+    assert all(seconds > 0 for seconds in results.values())
+
+
+def test_that_compare_flags_benchmarks_slower_than_the_threshold():
+    regressions = compare({'a': 1.2, 'b': 1.05, 'c': 1.0}, {'a': 1.0, 'b': 1.0}, threshold=0.1)
+
+    assert [regression.name for regression in regressions] == ['a']
+    assert round(regressions[0].change, 2) == 0.2
+
+
+def test_that_main_writes_results_and_fails_on_regressions(tmpdir):
+    output = str(tmpdir.join('results.json'))
+    baseline = str(tmpdir.join('baseline.json'))
+
+    with open(baseline, 'w') as baseline_file:
+        json.dump({'results': {'micro.plain.depth=1': 1e-12}}, baseline_file)
+
+    args = ['--depths', '1', '--sizes', '2', '--repeat', '1', '--min-time', '0', '--only', 'plain']
+    assert main(args + ['--output', output]) == 0
+    assert main(args + ['--baseline', baseline]) == 1
+
+    with open(output) as output_file:
+        assert set(json.load(output_file)['results']) == {'micro.plain.depth=1', 'macro.plain.size=2'}
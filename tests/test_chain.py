@@ -21,7 +21,20 @@ LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
 OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 SOFTWARE.
 """
-from chainsmoke.chain import compose
+import asyncio
+import gc
+import json
+import pickle
+import threading
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from chainsmoke.chain import (chain, compose, compile_compose, vectorized, transduce, mapping, filtering, taking,
+                              deduping, flat_mapping, async_chain, async_compose, branch)
+from chainsmoke.chain import wrap_func, _wrapped_funcs
+from chainsmoke.trace import Tracer, MemoryExporter, JsonLinesExporter
 
 
 def test_that_compose_can_use_a_wrapper_function():
@@ -38,3 +51,326 @@ def test_that_compose_can_use_a_wrapper_function():
     result = compose(mult_2, mult_2, wrap_with=add_two_to_result)(2)
 
     assert result == 14
+
+
+def add_one(num):
+    return num + 1
+
+
+def mult_2(num):
+    return num * 2
+
+
+def test_that_compile_compose_gives_the_same_result_as_compose():
+    assert compile_compose(add_one, mult_2, add_one)(3) == compose(add_one, mult_2, add_one)(3) == 9
+
+
+def test_that_compile_compose_flattens_nested_compositions():
+    composed = compile_compose(add_one, compose(mult_2, compose(add_one)), mult_2)
+
+    assert composed.funcs == (add_one, mult_2, add_one, mult_2)
+    assert composed(3) == 18
+
+
+def test_that_compile_compose_can_use_a_wrapper_function():
+    def add_two_to_result(func):
+        def inner(*args, **kwargs):
+            return func(*args, *kwargs) + 2
+
+        return inner
+
+    nested = compose(mult_2, mult_2)
+    wrapped = compile_compose(nested, mult_2, wrap_with=add_two_to_result)
+
+    assert wrapped(2) == compose(nested, mult_2, wrap_with=add_two_to_result)(2) == 22
+
+
+def test_that_compile_compose_with_no_functions_returns_the_value():
+    assert compile_compose()(5) == 5
+
+
+def test_that_map_batch_calls_vectorized_functions_once_with_the_whole_batch():
+    calls = []
+
+    @vectorized
+    def double_all(batch):
+        calls.append(batch)
+        return [value * 2 for value in batch]
+
+    result = compose(add_one, double_all, add_one).map_batch([1, 2, 3])
+
+    assert result == [5, 7, 9]
+    assert calls == [[2, 3, 4]]
+
+
+def test_that_map_batch_runs_functions_per_row_for_column_batches():
+    @vectorized
+    def total(columns):
+        return [x + y for x, y in zip(columns['x'], columns['y'])]
+
+    def swap_columns(row):
+        return {'x': row['y'], 'y': row['x']}
+
+    result = compose(swap_columns, compose(swap_columns), swap_columns, total).map_batch({'x': [1, 2], 'y': [10, 20]})
+
+    assert result == [11, 22]
+
+
+def test_that_wrapping_keeps_functions_vectorized():
+    def add_two_to_result(func):
+        def inner(batch):
+            return [value + 2 for value in func(batch)]
+
+        return inner
+
+    composed = compose(vectorized(lambda batch: [value * 2 for value in batch]), wrap_with=add_two_to_result)
+
+    assert composed.map_batch([1, 2]) == [4, 6]
+
+
+def test_that_map_batch_works_with_numpy_arrays():
+    numpy = pytest.importorskip('numpy')
+
+    result = compose(vectorized(numpy.sqrt), add_one).map_batch(numpy.array([1.0, 4.0, 9.0]))
+
+    assert isinstance(result, numpy.ndarray)
+    assert result.tolist() == [2.0, 3.0, 4.0]
+
+
+def test_that_transducers_fuse_into_a_single_stage_in_compose():
+    composed = compose(mapping(add_one), filtering(lambda x: x % 2 == 0), mapping(mult_2), list)
+
+    assert len(composed.funcs) == 2
+    assert composed([1, 2, 3, 4]) == [4, 8]
+
+
+def test_that_transducers_work_on_unbounded_generators():
+    def naturals():
+        n = 0
+        while True:
+            yield n
+            n += 1
+
+    result = chain(
+        naturals(),
+        mapping(mult_2),
+        flat_mapping(lambda x: [x, x]),
+        deduping(),
+        taking(3),
+        list
+    )
+
+    assert result == [0, 2, 4]
+
+
+def test_that_transduce_can_reduce_without_intermediate_collections():
+    fused = transduce(filtering(lambda x: x > 1), mapping(mult_2), taking(2))
+
+    assert fused.reduce(lambda total, x: total + x, [1, 2, 3, 4], 0) == 10
+
+
+def test_that_compositions_can_be_pickled():
+    for composed in (compose(add_one, mult_2), compile_compose(add_one, compose(mult_2))):
+        assert pickle.loads(pickle.dumps(composed))(3) == 8
+
+
+def test_that_parallel_map_keeps_the_order_of_the_values():
+    values = list(range(50))
+
+    assert compose(add_one, mult_2).parallel_map(values, workers=2, chunksize=7) == [(x + 1) * 2 for x in values]
+
+
+async def async_add_one(num):
+    await asyncio.sleep(0)
+    return num + 1
+
+
+def test_that_async_compose_awaits_coroutine_functions():
+    composed = async_compose(async_add_one, mult_2, async_add_one)
+
+    assert asyncio.run(composed(3)) == 9
+    assert asyncio.run(async_chain(3, async_add_one, mult_2, async_add_one)) == 9
+
+
+def test_that_async_compose_map_limits_concurrency_and_keeps_order():
+    in_flight = []
+    most_in_flight = []
+
+    async def track(num):
+        in_flight.append(num)
+        most_in_flight.append(len(in_flight))
+        await asyncio.sleep(0.001 * (num % 3))
+        in_flight.remove(num)
+        return num
+
+    result = asyncio.run(async_compose(track, mult_2).map(range(20), concurrency=4))
+
+    assert result == [num * 2 for num in range(20)]
+    assert max(most_in_flight) == 4
+
+
+def test_that_traced_compositions_record_a_span_per_function():
+    exporter = MemoryExporter()
+    composed = compose(add_one, compose(mult_2, name='inner'), tracer=Tracer(exporter), name='outer')
+
+    assert composed(3) == 8
+
+    root, = exporter.spans
+    assert [span.name for span in root.walk()] == ['outer', 'add_one', 'inner', 'mult_2']
+    assert all(span.trace_id == root.span_id and span.duration >= 0 for span in root.walk())
+
+
+def test_that_traced_chains_record_exceptions_and_export_json_lines(tmpdir):
+    path = str(tmpdir.join('spans.jsonl'))
+    exporter = JsonLinesExporter(path)
+
+    with pytest.raises(TypeError):
+        chain('a', add_one, mult_2, tracer=Tracer(exporter))
+    exporter.close()
+
+    with open(path) as spans_file:
+        spans = [json.loads(line) for line in spans_file]
+
+    assert [span['name'] for span in spans] == ['chain', 'add_one']
+    assert spans[1]['parent_id'] == spans[0]['span_id']
+    assert spans[0]['exception'].startswith('TypeError')
+
+
+def test_that_branch_runs_functions_concurrently_and_joins_the_results():
+    # each function waits until all three are running, so calling them one at a time breaks the barrier
+    barrier = threading.Barrier(3, timeout=5)
+
+    def slow(result):
+        def slow_inner(value):
+            barrier.wait()
+            return value + result
+
+        return slow_inner
+
+    composed = compose(add_one, branch(slow(1), compose(slow(2), mult_2), slow(3), join=lambda *r: list(r)), sum)
+
+    assert composed(1) == 3 + 8 + 5
+
+
+def test_that_branch_awaits_async_branches_in_async_compose():
+    started = []
+
+    async def slow_add_one(value):
+        # waits until both async branches are running, so awaiting them one at a time times out
+        started.append(value)
+        while len(started) < 2:
+            await asyncio.sleep(0.01)
+        return value + 1
+
+    composed = async_compose(branch(slow_add_one, async_compose(slow_add_one, mult_2), mult_2), list)
+
+    assert asyncio.run(asyncio.wait_for(composed(1), timeout=5)) == [2, 4, 2]
+
+
+def test_that_chain_only_wraps_each_function_once_per_wrapping_function():
+    wraps = []
+
+    def add_two_to_result(func):
+        wraps.append(func)
+
+        def inner(value):
+            return func(value) + 2
+
+        return inner
+
+    for _ in range(3):
+        assert chain(1, add_one, mult_2, wrap_with=add_two_to_result) == 10
+
+    compose(add_one, wrap_with=add_two_to_result)
+
+    assert wraps == [add_one, mult_2]
+
+
+def test_that_wrapped_module_level_functions_are_reused():
+    def wrap(func):
+        return lambda value: func(value)
+
+    assert wrap_func(wrap, add_one) is wrap_func(wrap, add_one)
+
+
+def test_that_wrapping_bound_methods_does_not_keep_their_instances_alive():
+    class Big:
+        def step(self, value):
+            return value + 1
+
+    def wrap(func):
+        return lambda value: func(value)
+
+    instances = [Big() for _ in range(100)]
+    references = [weakref.ref(instance) for instance in instances]
+
+    for instance in instances:
+        assert chain(1, instance.step, wrap_with=wrap) == 2
+
+    del instances, instance
+    gc.collect()
+
+    assert all(reference() is None for reference in references)
+    assert len(_wrapped_funcs.get(wrap, ())) == 0
+
+
+def test_that_branch_shuts_down_only_the_pool_it_owns():
+    with branch(add_one, mult_2) as owned:
+        assert owned(3) == (4, 6)
+        pool = owned._owned_executor
+
+    assert owned._owned_executor is None
+    assert pool._shutdown
+
+    executor = ThreadPoolExecutor(max_workers=1)
+    with branch(add_one, mult_2, executor=executor) as shared:
+        assert shared(3) == (4, 6)
+
+    assert not executor._shutdown
+    assert executor.submit(add_one, 1).result() == 2
+    executor.shutdown()
+
+    dropped = branch(add_one, mult_2)
+    dropped(1)
+    pool = dropped._owned_executor
+    del dropped
+    gc.collect()
+
+    assert pool._shutdown
+
+
+def test_that_async_compose_map_rejects_a_concurrency_below_one():
+    with pytest.raises(ValueError):
+        asyncio.run(async_compose(add_one).map([1, 2], concurrency=0))
+
+
+def test_that_async_compose_map_cancels_the_other_workers_when_one_fails():
+    finished = []
+
+    async def stage(value):
+        if value == 0:
+            raise ValueError('bad value')
+        await asyncio.sleep(0.05)
+        finished.append(value)
+        return value
+
+    async def run():
+        with pytest.raises(ValueError):
+            await async_compose(stage).map(range(5), concurrency=5)
+        await asyncio.sleep(0.1)
+
+    asyncio.run(run())
+    assert finished == []
+
+
+def test_that_closing_a_branch_releases_its_pool():
+    owned = branch(add_one, mult_2)
+    pools = []
+
+    for _ in range(3):
+        owned(1)
+        pools.append(weakref.ref(owned._owned_executor))
+        owned.close()
+
+    gc.collect()
+    assert [pool() for pool in pools] == [None, None, None]
@@ -0,0 +1,163 @@
+"""
+Unit tests for checkpoint.py
+
+Copyright (C) 2016  Alex Hendrie Bielen
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and
+to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+The above copyright notice and this permission notice shall be included in all copies or
+substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED
+TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF
+CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+OTHER DEALINGS IN THE SOFTWARE.
+"""
+import os
+import subprocess
+import sys
+
+import pytest
+
+from chainsmoke.chain import compose, mapping
+from chainsmoke.checkpoint import (incremental_compose, input_key, stage_identity, MemoryCheckpointStore,
+                                   DiskCheckpointStore)
+
+calls = []
+
+
+def parse(value):
+    calls.append('parse')
+    return int(value)
+
+
+def double(value):
+    calls.append('double')
+    return value * 2
+
+
+def add_one(value):
+    calls.append('add_one')
+    return value + 1
+
+
+def add_two(value):
+    calls.append('add_two')
+    return value + 2
+
+
+def test_that_only_the_changed_suffix_of_the_chain_is_recomputed():
+    store = MemoryCheckpointStore()
+    incremental_compose(parse, double, add_one, store=store)('3')
+
+    del calls[:]
+    assert incremental_compose(parse, compose(double, add_two), store=store)('3') == 8
+    assert calls == ['add_two']
+
+    del calls[:]
+    assert incremental_compose(parse, double, add_two, store=store)('3') == 8
+    assert incremental_compose(parse, double, store=store)('3') == 6
+    assert calls == []
+
+
+def test_that_versions_change_the_identity_of_a_stage():
+    def stage(value):
+        return value
+
+    unversioned = stage_identity(stage)
+    stage.version = 2
+
+    assert stage_identity(stage) != unversioned
+    assert stage_identity(stage).endswith('stage@2')
+
+
+def test_that_the_memory_store_is_bounded():
+    store = MemoryCheckpointStore(maxsize=2)
+    chained = incremental_compose(parse, double, store=store)
+
+    for value in ('1', '2', '3'):
+        chained(value)
+
+    assert len(store.checkpoints) == 2
+
+
+def test_that_checkpoints_can_be_stored_on_disk(tmpdir):
+    store = DiskCheckpointStore(str(tmpdir.join('checkpoints')))
+    incremental_compose(parse, double, store=store)('4')
+
+    del calls[:]
+    assert incremental_compose(parse, double, add_one, store=DiskCheckpointStore(store.directory))('4') == 9
+    assert calls == ['add_one']
+
+
+def test_that_the_identity_covers_names_nested_code_and_closures():
+    def upper(value):
+        return value.upper()
+
+    def lower(value):
+        return value.lower()
+
+    # same name so that only the code tells them apart
+    lower.__qualname__ = upper.__qualname__
+
+    def make_stage(factor):
+        def stage(value):
+            return [item * factor for item in value]
+        return stage
+
+    def make_nested(op):
+        def stage(value):
+            return list(map(lambda item: op(item), value))
+        return stage
+
+    assert stage_identity(upper) != stage_identity(lower)
+    assert stage_identity(make_stage(2)) != stage_identity(make_stage(3))
+    assert stage_identity(make_stage(2)) == stage_identity(make_stage(2))
+    assert stage_identity(make_nested(str.upper)) != stage_identity(make_nested(str.lower))
+
+
+def test_that_inputs_are_keyed_by_a_stable_digest():
+    store = MemoryCheckpointStore()
+    chained = incremental_compose(len, double, store=store)
+
+    assert chained([1, 2]) == 4
+    del calls[:]
+    assert chained([1, 2]) == 4
+    assert calls == []
+
+    summed = incremental_compose(sum, double, store=store)
+    with pytest.raises(TypeError):
+        summed(item for item in [1])
+
+    assert summed((item for item in [1]), key='one element') == 2
+
+
+def test_that_iterators_are_not_checkpointed():
+    store = MemoryCheckpointStore()
+    increment = mapping(lambda value: value + 1)
+
+    assert incremental_compose(increment, list, store=store)([1, 2, 3]) == [2, 3, 4]
+    assert incremental_compose(increment, sorted, store=store)([1, 2, 3]) == [2, 3, 4]
+    assert incremental_compose(iter, list, store=store)([1, 2]) == [1, 2]
+    assert incremental_compose(iter, list, store=store)([1, 2]) == [1, 2]
+
+
+def test_that_identities_and_keys_are_the_same_across_hash_seeds():
+    script = '\n'.join([
+        'from chainsmoke.checkpoint import input_key, stage_identity',
+        'def is_vowel(c):',
+        "    return c in {'a', 'e', 'i', 'o', 'u'}",
+        "print(stage_identity(is_vowel), input_key({'b': 1, 'a': {'x', 'y', 'z'}}))",
+    ])
+
+    outputs = set()
+    for seed in ('1', '2', '3', '4'):
+        environment = dict(os.environ, PYTHONHASHSEED=seed)
+        outputs.add(subprocess.check_output([sys.executable, '-c', script], env=environment,
+                                            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+    assert len(outputs) == 1
+    assert input_key({'b': 1, 'a': 2}) == input_key({'a': 2, 'b': 1})
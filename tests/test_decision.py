@@ -23,7 +23,15 @@ LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
 OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 SOFTWARE.
 """
-from chainsmoke.decide import Decision, Action
+import asyncio
+import json
+import sys
+
+import pytest
+
+from chainsmoke.chain import vectorized
+from chainsmoke.decide import (Decision, Action, KeyEquals, Router, compile_tree, profile_tree, unprofile_tree,
+                               dump_tree, load_tree, next_async)
 
 
 class DriversLicense(object):
@@ -77,3 +85,354 @@ def test_that_decision_tree_behaves_properly():
     assert alex_result.path == 'check that person is over 21 -> check that out of state id is valid -> do not allow in bar'
     assert dave_result.path == 'check that person is over 21 -> do not allow in bar'
     assert denis_result.path == 'check that person is over 21 -> check that out of state id is valid -> allow in bar'
+
+
+def test_that_compiled_tree_gives_the_same_results_as_the_tree():
+    compiled = compile_tree(check_over_21)
+
+    assert len(compiled) == 4
+    for license in (alex_drivers_license, dave_drivers_license, denis_drivers_license):
+        assert compiled.next(license) == check_over_21.next(license)
+
+
+def test_that_compiled_tree_keeps_the_path_as_node_ids():
+    result = compile_tree(check_over_21).next(dave_drivers_license)
+
+    assert list(result.path_ids) == [0, 1]
+    assert result.path == 'check that person is over 21 -> do not allow in bar'
+
+
+def test_that_compiled_tree_handles_trees_deeper_than_the_recursion_limit():
+    node = Action('done', lambda x: x)
+    for index in range(sys.getrecursionlimit() * 2):
+        node = Decision(str(index), lambda x: False, false_next=node, true_next=node)
+
+    result = compile_tree(node).next('value')
+
+    assert result.value == 'value'
+    assert len(result.path_ids) == sys.getrecursionlimit() * 2 + 1
+
+
+def test_that_next_batch_splits_the_batch_at_each_decision():
+    numpy = pytest.importorskip('numpy')
+    calls = []
+
+    @vectorized
+    def is_adult(ages):
+        calls.append(len(ages))
+        return ages >= 21
+
+    def is_senior(age):
+        return age >= 65
+
+    adult_tree = Decision('adult', is_adult,
+                          false_next=Action('minor', vectorized(lambda ages: ages * 0)),
+                          true_next=Decision('senior', is_senior,
+                                             false_next=Action('adult', lambda age: 'adult'),
+                                             true_next=Action('senior', lambda age: 'senior')))
+    compiled = compile_tree(adult_tree)
+
+    result = compiled.next_batch(numpy.array([30, 10, 70, 21]))
+
+    assert result.values.tolist() == ['adult', 0, 'senior', 'adult']
+    assert [compiled.names[leaf_id] for leaf_id in result.leaf_ids] == ['adult', 'minor', 'senior', 'adult']
+    assert calls == [4]
+
+
+def test_that_next_batch_works_with_columns():
+    pytest.importorskip('numpy')
+    tree = Decision('over 21', vectorized(lambda columns: columns['age'] >= 21),
+                    false_next=Action('do not allow in bar', lambda row: 'Get out, ' + row['name']),
+                    true_next=Action('allow in bar', lambda row: 'Welcome, ' + row['name']))
+
+    result = compile_tree(tree).next_batch({'age': [29, 20], 'name': ['Alex', 'Dave']})
+
+    assert result.values.tolist() == ['Welcome, Alex', 'Get out, Dave']
+    assert result.leaf_ids.tolist() == [2, 1]
+
+
+def test_that_a_shared_predicate_is_called_once_per_traversal():
+    calls = []
+
+    def is_premium(customer):
+        calls.append(customer)
+        return customer == 'premium'
+
+    tree = Decision('premium first', is_premium,
+                    false_next=Action('standard', lambda x: 'standard'),
+                    true_next=Decision('premium again', is_premium,
+                                       false_next=Action('never', lambda x: 'never'),
+                                       true_next=Action('premium', lambda x: 'premium')))
+    compiled = compile_tree(tree)
+
+    assert compiled.shares_predicates
+    assert compiled.next('premium') == tree.next('premium')
+    assert calls == ['premium', 'premium', 'premium']
+
+
+def test_that_cached_results_skip_the_traversal():
+    calls = []
+
+    def over_21(age):
+        calls.append(age)
+        return age >= 21
+
+    compiled = compile_tree(Decision('over 21', over_21, false_next=Action('no', lambda x: False),
+                                     true_next=Action('yes', lambda x: True)), cache_size=2)
+
+    assert [compiled.next(age).value for age in (30, 30, 10, 30)] == [True, True, False, True]
+    assert calls == [30, 10]
+    assert compiled.cache.stats().hits == 2
+
+
+def test_that_profile_tree_counts_visits_and_outcomes():
+    profile = profile_tree(check_over_21)
+
+    try:
+        for license in (alex_drivers_license, dave_drivers_license, denis_drivers_license):
+            check_over_21.next(license)
+    finally:
+        unprofile_tree(check_over_21)
+
+    check_over_21.next(alex_drivers_license)
+    nodes = {node['name']: node for node in json.loads(profile.to_json())['nodes']}
+
+    assert nodes['check that person is over 21']['visits'] == 3
+    assert nodes['check that person is over 21']['true'] == 2
+    assert nodes['do not allow in bar']['visits'] == 2
+    assert nodes['allow in bar']['latency']['count'] == 1
+    root_line, hot_line = profile.render().splitlines()[:2]
+    assert root_line.startswith('check that person is over 21 [visits=3 true=2 false=1 p50<=')
+    assert hot_line.startswith('    *T: check that out of state id is valid [visits=2 true=1 false=1')
+
+
+def test_that_a_tree_can_be_dumped_and_loaded_by_name(tmpdir):
+    path = str(tmpdir.join('tree.cstree'))
+    registry = {
+        'over_21': check_over_21.predicate,
+        'check_out_of_state': check_out_of_state,
+        'do_not_allow': do_not_allow_in_bar.action,
+        'allow': allow_into_bar.action,
+    }
+
+    dump_tree(check_over_21, path, registry)
+    loaded = load_tree(path, registry)
+
+    assert len(loaded) == 4
+    for license in (alex_drivers_license, dave_drivers_license, denis_drivers_license):
+        assert loaded.next(license) == check_over_21.next(license)
+
+
+def test_that_tree_files_are_read_as_32_bit_integers_on_big_endian_hosts(tmpdir, monkeypatch):
+    path = str(tmpdir.join('tree.cstree'))
+    registry = {'over_21': check_over_21.predicate, 'check_out_of_state': check_out_of_state,
+                'do_not_allow': do_not_allow_in_bar.action, 'allow': allow_into_bar.action}
+
+    # both sides byteswap, so the round trip goes through the big-endian code path
+    monkeypatch.setattr(sys, 'byteorder', 'big')
+    dump_tree(check_over_21, path, registry)
+    loaded = load_tree(path, registry)
+
+    assert list(loaded.kinds) == list(compile_tree(check_over_21).kinds)
+    assert loaded.next(alex_drivers_license) == check_over_21.next(alex_drivers_license)
+
+
+def test_that_load_tree_rejects_truncated_files(tmpdir):
+    path = str(tmpdir.join('tree.cstree'))
+    registry = {'over_21': check_over_21.predicate, 'check_out_of_state': check_out_of_state,
+                'do_not_allow': do_not_allow_in_bar.action, 'allow': allow_into_bar.action}
+    dump_tree(check_over_21, path, registry)
+
+    with open(path, 'rb') as tree_file:
+        data = tree_file.read()
+
+    for length in (10, len(data) - 1):
+        with open(path, 'wb') as tree_file:
+            tree_file.write(data[:length])
+
+        with pytest.raises(ValueError):
+            load_tree(path, registry)
+
+
+def test_that_dump_tree_requires_every_function_to_be_registered(tmpdir):
+    with pytest.raises(ValueError):
+        dump_tree(check_over_21, str(tmpdir.join('tree.cstree')), {'over_21': check_over_21.predicate})
+
+
+def slow_predicate(result, calls):
+    async def predicate(data):
+        calls.append(result)
+        await asyncio.sleep(0.1)
+        return result
+
+    return predicate
+
+
+def test_that_next_async_awaits_predicates_and_actions():
+    async def greet(license):
+        return 'Welcome, ' + license.name
+
+    tree = Decision('over 21', slow_predicate(True, []), false_next=do_not_allow_in_bar,
+                    true_next=Action('greet', greet))
+
+    result = asyncio.run(next_async(tree, denis_drivers_license))
+
+    assert result == ('Welcome, Denis', 'over 21 -> greet')
+    assert asyncio.run(next_async(check_over_21, alex_drivers_license)) == check_over_21.next(alex_drivers_license)
+
+
+def test_that_speculative_next_async_resolves_subtrees_while_the_predicate_is_pending():
+    events = []
+    actions = []
+
+    def predicate(name, result):
+        async def predicate_inner(data):
+            events.append(('start', name))
+            await asyncio.sleep(0.05)
+            events.append(('end', name))
+            return result
+
+        return predicate_inner
+
+    def leaf(name):
+        return Action(name, lambda data: actions.append(name) or name)
+
+    tree = Decision('first', predicate('first', False),
+                    false_next=Decision('second', predicate('second', True), false_next=leaf('a'),
+                                        true_next=leaf('b')),
+                    true_next=Decision('third', predicate('third', True), false_next=leaf('c'),
+                                       true_next=leaf('d')))
+
+    result = asyncio.run(next_async(tree, None, speculate_depth=1))
+
+    assert result == ('b', 'first -> second -> b')
+    # both subtrees started their predicates before the first predicate finished
+    assert events.index(('start', 'second')) < events.index(('end', 'first'))
+    assert events.index(('start', 'third')) < events.index(('end', 'first'))
+    assert actions == ['b']
+
+
+class CountingDict(dict):
+    lookups = 0
+
+    def __getitem__(self, key):
+        CountingDict.lookups += 1
+        return super().__getitem__(key)
+
+
+def test_that_a_chain_of_key_equals_decisions_compiles_to_a_single_lookup():
+    domestic = Action('domestic', lambda order: 'domestic')
+    tree = Decision('US', KeyEquals('country', 'US'),
+                    false_next=Decision('CA', KeyEquals('country', 'CA'),
+                                        false_next=Decision('MX', KeyEquals('country', 'MX'),
+                                                            false_next=Action('overseas', lambda order: 'overseas'),
+                                                            true_next=Action('mexico', lambda order: 'mexico')),
+                                        true_next=domestic),
+                    true_next=domestic)
+    compiled = compile_tree(tree)
+
+    assert list(compiled.switches) == [0]
+    for country in ('US', 'CA', 'MX', 'FR'):
+        order = CountingDict(country=country)
+        expected = tree.next(order)
+        CountingDict.lookups = 0
+
+        assert compiled.next(order) == expected
+        assert CountingDict.lookups == 1
+
+
+def test_that_key_equals_switches_fall_back_for_unhashable_values():
+    tree = Decision('list', KeyEquals('value', [1]),
+                    false_next=Decision('tuple', KeyEquals('value', (1,)), false_next=Action('neither', str),
+                                        true_next=Action('tuple', str)),
+                    true_next=Action('list', str))
+    compiled = compile_tree(tree)
+
+    assert compiled.switches == {}
+    assert compiled.next({'value': [1]}).path == 'list -> list'
+
+    hashable_tree = compile_tree(Decision('a', KeyEquals('value', 'a'),
+                                          false_next=Decision('b', KeyEquals('value', 'b'),
+                                                              false_next=Action('neither', str),
+                                                              true_next=Action('b', str)),
+                                          true_next=Action('a', str)))
+
+    assert hashable_tree.next({'value': ['b']}).path == 'a -> b -> neither'
+
+
+def make_routing_tree(calls):
+    def sink(name):
+        def action(records):
+            calls.append((name, list(records)))
+            return len(records)
+
+        return action
+
+    return Decision('is even', lambda n: n % 2 == 0, false_next=Action('odd', sink('odd')),
+                    true_next=Action('even', sink('even')))
+
+
+def test_that_router_calls_each_leaf_once_per_batch():
+    calls = []
+    router = Router(make_routing_tree(calls), max_batch=3)
+
+    batches = list(router.route(range(10)))
+
+    assert [(batch.leaf, batch.records, batch.value) for batch in batches] == [
+        ('even', [0, 2, 4], 3), ('odd', [1, 3, 5], 3), ('even', [6, 8], 2), ('odd', [7, 9], 2)]
+    assert len(calls) == 4
+    assert router.buffers == {}
+
+
+def test_that_router_flushes_buffers_after_max_wait():
+    now = [0.0]
+    router = Router(make_routing_tree([]), max_batch=100, max_wait=5, clock=lambda: now[0])
+
+    assert router.add(0) == []
+    now[0] = 6.0
+    assert router.add(1) == [router.tree.names.index('even')]
+
+
+def test_that_router_routes_async_streams_and_flushes_idle_buffers():
+    calls = []
+
+    async def stream():
+        yield 1
+        yield 2
+        await asyncio.sleep(0.2)
+        yield 3
+
+    async def collect():
+        return [batch async for batch in Router(make_routing_tree(calls), max_batch=10,
+                                                max_wait=0.05).route_async(stream())]
+
+    batches = asyncio.run(collect())
+
+    assert sorted((batch.leaf, batch.records) for batch in batches[:2]) == [('even', [2]), ('odd', [1])]
+    assert [(batch.leaf, batch.records) for batch in batches[2:]] == [('odd', [3])]
+
+
+def test_that_router_rejects_an_empty_batch_size():
+    with pytest.raises(ValueError):
+        Router(make_routing_tree([]), max_batch=0)
+
+
+def test_that_the_result_cache_tells_equal_values_of_different_types_apart():
+    tree = Decision('is bool', lambda x: isinstance(x, bool), false_next=Action('number', str),
+                    true_next=Action('flag', str))
+    compiled = compile_tree(tree, cache_size=10)
+
+    assert compiled.next(1).path == 'is bool -> number'
+    assert compiled.next(True).path == 'is bool -> flag'
+
+
+def test_that_tree_results_can_be_indexed_and_hashed_like_results():
+    result = compile_tree(check_over_21).next(alex_drivers_license)
+    expected = check_over_21.next(alex_drivers_license)
+
+    assert (result[0], result[1], result[-1], result[:1]) == (expected[0], expected[1], expected[-1], expected[:1])
+    assert len(result) == 2
+    assert {result: 'cached'}[expected] == 'cached'
+    assert hash(result) == hash(expected)
+    with pytest.raises(IndexError):
+        result[2]
@@ -20,7 +20,9 @@ import pytest
 from unittest.mock import MagicMock, call
 
 from chainsmoke.chain import combine
+from chainsmoke.functools import memoize, retry
 from chainsmoke.log import log_it
+from chainsmoke.railroad import railroad_it, Either, Good, Error, Maybe, Just, Nothing
 from chainsmoke.validate import validate_it
 
 
@@ -67,3 +69,92 @@ def test_that_validate_works_when_used_with_log_through_combine():
 
     assert exception_info.value.args[
                0] == "add_three expects type <class 'int'> for arg z but received value 3 with type of <class 'str'>"
+
+
+def test_that_combine_wraps_the_function_in_a_single_layer():
+    validate_and_log = combine(log_it(MagicMock()), validate_it)
+
+    def add_two(x: int, y: int) -> int:
+        total = x + y
+        return total
+
+    combined = validate_and_log(add_two)
+
+    assert combined.func is add_two
+    assert combined(1, 2) == 3
+
+
+def test_that_combine_behaves_like_stacked_retry_and_railroad_decorators():
+    combined_logger = MagicMock()
+    stacked_logger = MagicMock()
+    attempts = []
+
+    def divide_ten(x: int) -> float:
+        attempts.append(x)
+        return 10 / x
+
+    combined = combine(railroad_it(Either), retry(pause=0, num_retries=2), log_it(combined_logger),
+                       validate_it)(divide_ten)
+    stacked = railroad_it(Either)(log_it(stacked_logger)(retry(pause=0, num_retries=2)(validate_it(divide_ten))))
+
+    assert combined(Good(2)).value == stacked(Good(2)).value == 5
+    assert isinstance(combined(Error('bad')), Error)
+
+    del attempts[:]
+    combined_failure = combined(0)
+    assert len(attempts) == 3
+    stacked_failure = stacked(0)
+
+    assert isinstance(combined_failure, Good) and isinstance(stacked_failure, Good)
+    assert isinstance(combined_failure.value, ZeroDivisionError)
+    assert isinstance(combined(Good('2')).value, TypeError)
+    assert combined_logger.call_args_list[:2] == [call('divide_ten called with args: (2,) and kwargs {}'),
+                                                  call('divide_ten returned result 5.0')]
+
+
+def test_that_combine_returns_nothing_when_the_railroaded_function_raises():
+    def divide_ten(x: int) -> float:
+        return 10 / x
+
+    combined = combine(railroad_it(Maybe), validate_it)(divide_ten)
+
+    assert isinstance(combined(0), Nothing)
+    assert isinstance(combined(Nothing()), Nothing)
+    assert combined(Just(5)).value == 2
+
+
+def test_that_each_wrapper_can_decorate_a_method():
+    logger = MagicMock()
+
+    class Counter:
+        def __init__(self, start):
+            self.start = start
+
+        @log_it(logger=logger)
+        def logged(self, x):
+            return self.start + x
+
+        @validate_it
+        def validated(self, x: int) -> int:
+            return self.start + x
+
+        @railroad_it(Either)
+        def railroaded(self, x):
+            return self.start + x
+
+        @combine(validate_it, log_it(logger=logger))
+        def combined(self, x: int) -> int:
+            return self.start + x
+
+        @memoize()
+        def memoized(self, x):
+            return self.start + x
+
+    counter = Counter(1)
+
+    assert counter.logged(1) == 2
+    assert counter.validated(1) == 2
+    assert counter.railroaded(Good(1)).value == 2
+    assert counter.combined(1) == 2
+    assert counter.memoized(1) == 2
+    assert Counter.logged(counter, 2) == 3
@@ -18,7 +18,8 @@ OTHER DEALINGS IN THE SOFTWARE.
 """
 import pytest
 
-from chainsmoke.functools import swap, reorder, retry, curry, ChainSmokeFunctoolsError
+from chainsmoke.chain import compose
+from chainsmoke.functools import swap, reorder, retry, curry, memoize, Memoized, CacheStats, ChainSmokeFunctoolsError
 
 
 def test_that_swap_correctly_swaps_arguments():
@@ -162,3 +163,72 @@ def test_that_curry_correctly_works_with_default_arguments():
     assert add_one_number_to_default(1) == 19
     assert add_two_numbers_to_default(1, 2) == 19
     assert add_one_number_to_different_default(1) == 18
+
+
+def test_that_memoize_only_calls_the_function_once_per_argument():
+    calls = []
+
+    @memoize(maxsize=2)
+    def double(x):
+        calls.append(x)
+        return x * 2
+
+    result = compose(double, double)(1)
+    double(1)
+    double(2)
+    double(4)
+
+    assert result == 4
+    assert calls == [1, 2, 4]
+    assert double.stats() == CacheStats(hits=2, misses=3, unhashable=0, size=2)
+
+
+def test_that_memoize_evicts_the_least_recently_used_result():
+    calls = []
+
+    @memoize(maxsize=2)
+    def identity(x):
+        calls.append(x)
+        return x
+
+    for x in (1, 2, 1, 3, 1, 2):
+        identity(x)
+
+    assert calls == [1, 2, 3, 2]
+
+
+def test_that_memoize_expires_results_after_the_ttl():
+    now = [0]
+    calls = []
+
+    def identity(x):
+        calls.append(x)
+        return x
+
+    memoized = Memoized(identity, ttl=10, clock=lambda: now[0])
+    memoized(1)
+    now[0] = 5
+    memoized(1)
+    now[0] = 11
+    memoized(1)
+
+    assert calls == [1, 1]
+
+
+def test_that_memoize_skips_unhashable_arguments():
+    @memoize()
+    def total(values):
+        return sum(values)
+
+    assert total([1, 2]) == 3
+    assert total([1, 2]) == 3
+    assert total.stats() == CacheStats(hits=0, misses=0, unhashable=2, size=0)
+
+
+def test_that_typed_memoize_caches_arguments_of_different_types_separately():
+    @memoize(typed=True)
+    def describe(value):
+        return type(value).__name__
+
+    assert [describe(1), describe(1.0), describe(True)] == ['int', 'float', 'bool']
+    assert describe.stats().size == 3
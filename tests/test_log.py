@@ -19,9 +19,10 @@ OTHER DEALINGS IN THE SOFTWARE.
 
 from unittest.mock import MagicMock, call
 from functools import partial
+import pickle
 
 from chainsmoke.log import log_it
-from chainsmoke.chain import chain
+from chainsmoke.chain import chain, compose
 
 
 # some very simple functions
@@ -111,3 +112,11 @@ def test_that_internal_log_decorator_can_accept_an_arbitary_name_for_a_function(
             call('arbitrary_func_name returned result 3')
         ]
     )
+
+
+def test_that_logged_functions_can_be_pickled():
+    logged = compose(simple_addition, wrap_with=log_it(print))
+    unpickled = pickle.loads(pickle.dumps(logged))
+
+    assert unpickled.funcs[0].function_name == 'simple_addition'
+    assert unpickled.funcs[0].func is simple_addition
@@ -16,9 +16,12 @@ THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABI
 CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
 OTHER DEALINGS IN THE SOFTWARE.
 """
+import json
+
 import pytest
 
-from chainsmoke.match import Match, otherwise, ChainsmokePatternMatchError
+from chainsmoke.chain import vectorized
+from chainsmoke.match import Match, otherwise, guard, freeze, canonical_key, ChainsmokePatternMatchError
 
 easy_match = Match()
 bad_match = Match()
@@ -73,3 +76,274 @@ def test_that_match_raises_an_exception_when_there_is_not_an_otherwise_case():
 def test_that_match_works_with_recursive_factorial():
     assert factorial(5) == 120
 
+
+shape_match = Match()
+
+
+@shape_match(0, otherwise)
+def describe(x, y):
+    return 'on the y axis'
+
+
+@shape_match(int, 0)
+def describe(x, y):
+    return 'on the x axis'
+
+
+@shape_match(bool, otherwise)
+def describe(x, y):
+    return 'a flag'
+
+
+@shape_match(guard(lambda x: isinstance(x, int) and x < 0), otherwise)
+def describe(x, y):
+    return 'left'
+
+
+@shape_match(float, otherwise)
+def describe(x, y):
+    return 'a float'
+
+
+@shape_match(otherwise, otherwise)
+def describe(x, y):
+    return 'somewhere'
+
+
+def test_that_match_works_with_wildcards_types_and_guards():
+    assert describe(0, 5) == 'on the y axis'
+    assert describe(3, 0) == 'on the x axis'
+    assert describe(True, 1) == 'a flag'
+    assert describe(-2.5, 1) == 'a float'
+    assert describe(-2, 1) == 'left'
+    assert describe('a', 'b') == 'somewhere'
+
+
+def test_that_match_prefers_literals_then_types_then_guards():
+    ordered = Match()
+
+    @ordered(guard(lambda x: True))
+    def kind(x):
+        return 'guard'
+
+    @ordered(int)
+    def kind(x):
+        return 'int'
+
+    @ordered(1)
+    def kind(x):
+        return 'one'
+
+    @ordered(otherwise)
+    def kind(x):
+        return 'other'
+
+    assert kind(1) == 'one'
+    assert kind(2) == 'int'
+    assert kind('a') == 'guard'
+    assert ordered.find_func(()) is None
+
+
+def test_that_match_backtracks_when_a_specific_pattern_does_not_complete():
+    assert describe(0, 0) == 'on the y axis'
+    assert describe(4, 4) == 'somewhere'
+
+
+def test_that_type_dispatch_is_cached_per_type_tuple_and_invalidated_on_registration():
+    by_type = Match()
+
+    class Animal:
+        pass
+
+    class Dog(Animal):
+        pass
+
+    @by_type(Animal, otherwise)
+    def speak(animal, volume):
+        return 'animal'
+
+    @by_type(otherwise, otherwise)
+    def speak(animal, volume):
+        return 'nothing'
+
+    assert speak(Dog(), 1) == 'animal'
+    assert speak(Dog(), 2) == 'animal'
+    assert speak(object(), 1) == 'nothing'
+    assert by_type.dispatch_cache == {(Dog, int): by_type.funcs[(Animal, otherwise)],
+                                      (object, int): by_type.funcs[(otherwise, otherwise)]}
+
+    @by_type(Dog, int)
+    def speak(animal, volume):
+        return 'dog'
+
+    assert by_type.dispatch_cache == {}
+    assert speak(Dog(), 1) == 'dog'
+    assert speak(Dog(), 'loud') == 'animal'
+
+
+structure_match = Match()
+
+
+@structure_match([1, 2])
+def structure(value):
+    return 'pair'
+
+
+@structure_match({'a': [1], 'b': {2}})
+def structure(value):
+    return 'nested'
+
+
+@structure_match((1, 2))
+def structure(value):
+    return 'tuple'
+
+
+@structure_match(otherwise)
+def structure(value):
+    return 'other'
+
+
+def test_that_match_works_with_unhashable_arguments():
+    assert structure([1, 2]) == 'pair'
+    assert structure((1, 2)) == 'tuple'
+    assert structure({'b': {2}, 'a': [1]}) == 'nested'
+    assert structure([2, 1]) == 'other'
+    assert structure([bytearray()]) == 'other'
+
+
+def test_that_frozen_arguments_reuse_their_canonical_key():
+    frozen = freeze({'a': [1], 'b': {2}})
+
+    assert structure(frozen) == 'nested'
+    assert frozen._key is not None
+    assert structure(freeze([1, 2])) == 'pair'
+    assert canonical_key([frozen]) == canonical_key([{'a': [1], 'b': {2}}])
+    assert canonical_key([1, 2]) != canonical_key((1, 2))
+
+
+def test_that_map_groups_calls_by_handler_and_keeps_the_input_order():
+    batched = Match()
+    batch_sizes = []
+
+    @batched(int, otherwise)
+    @vectorized
+    def scale(xs, factors):
+        batch_sizes.append(len(xs))
+        return [x * factor for x, factor in zip(xs, factors)]
+
+    @batched(otherwise, otherwise)
+    def scale(x, factor):
+        return 'skipped'
+
+    assert scale.map([1, 'a', 2, 3], [10, 10, 10, 2]) == [10, 'skipped', 20, 6]
+    assert batch_sizes == [3]
+    assert batched.dispatch_many([('b', 1), (4, 4)]) == ['skipped', 16]
+    assert scale.map([], []) == []
+
+
+def test_that_map_raises_when_there_is_not_an_otherwise_case():
+    with pytest.raises(ChainsmokePatternMatchError):
+        no_otherwise.map([1])
+
+
+def test_that_match_stats_count_calls_per_pattern_and_fallbacks():
+    counted = Match()
+
+    @counted(1)
+    def number(n):
+        return 'one'
+
+    @counted(otherwise)
+    @vectorized
+    def number(ns):
+        return ['other'] * len(ns)
+
+    handler = counted.find_func((1,))
+    stats = counted.enable_stats()
+
+    assert number(1) == 'one'
+    assert number.map([1, 2, 3]) == ['one', 'other', 'other']
+
+    snapshot = stats.snapshot()
+    assert snapshot['calls'] == 4
+    assert snapshot['fallback_calls'] == 2
+    assert snapshot['fallback_rate'] == 0.5
+    assert [(pattern['pattern'], pattern['handler'], pattern['calls'], pattern['latency']['count'])
+            for pattern in snapshot['patterns']] == [('1', 'number', 2, 2), ('otherwise', 'number', 2, 1)]
+    assert json.loads(stats.to_json()) == snapshot
+
+    counted.disable_stats()
+
+    assert counted.find_func((1,)) is handler
+    assert number(1) == 'one'
+    assert stats.snapshot()['calls'] == 4
+
+
+def test_that_hashable_arguments_match_patterns_with_canonical_keys():
+    sets = Match()
+
+    @sets(frozenset({1, 2}))
+    def kind(value):
+        return 'pair'
+
+    @sets((0, frozenset({3})))
+    def kind(value):
+        return 'nested'
+
+    @sets(otherwise)
+    def kind(value):
+        return 'other'
+
+    assert kind(frozenset({1, 2})) == 'pair'
+    assert kind({1, 2}) == 'pair'
+    assert kind((0, frozenset({3}))) == 'nested'
+    assert kind((0, {3})) == 'nested'
+    assert kind(frozenset({1})) == 'other'
+    assert canonical_key((0, frozenset({3}))) == (0, frozenset({3}))
+
+
+def test_that_vectorized_handlers_work_for_single_calls_and_batches():
+    mixed = Match()
+
+    @mixed(int)
+    @vectorized
+    def square(xs):
+        return [x * x for x in xs]
+
+    @mixed(otherwise)
+    def square(x):
+        return None
+
+    assert square(3) == 9
+    assert square('a') is None
+    assert square.map([1, 'a', 2]) == [1, None, 4]
+    assert [square(value) for value in [1, 'a', 2]] == square.map([1, 'a', 2])
+
+
+def test_that_unrelated_type_patterns_are_tried_in_the_order_of_the_mro():
+    by_mro = Match()
+
+    class A:
+        pass
+
+    class C:
+        pass
+
+    class D(C, A):
+        pass
+
+    @by_mro(A)
+    def which(value):
+        return 'A'
+
+    @by_mro(C)
+    def which(value):
+        return 'C'
+
+    @by_mro(otherwise)
+    def which(value):
+        return 'other'
+
+    assert which(D()) == 'C'
+    assert which(A()) == 'A'
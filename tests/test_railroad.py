@@ -14,6 +14,8 @@ THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABI
 CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
 OTHER DEALINGS IN THE SOFTWARE.
 """
+import pickle
+
 import pytest
 
 from chainsmoke.railroad import railroad_it, Maybe, Either, Error, Just, Nothing
@@ -200,3 +202,10 @@ def test_that_exception_is_raised_when_incorrect_type_is_passed_to_railroad():
         railroad_it(NonValidRailroadType)
 
     assert exception_info.value.args[0] == 'NonValidRailroadType is not a valid railroad type; try Either or Maybe.'
+
+
+def test_that_railroad_functions_can_be_pickled():
+    unpickled = pickle.loads(pickle.dumps(compose(add_3_to_either, add_4_to_either)))
+
+    assert unpickled(add_2_to_either(6)).value == 15
+    assert pickle.loads(pickle.dumps(add_2_to_maybe))(1).value == 3
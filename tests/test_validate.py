@@ -16,6 +16,8 @@ THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABI
 CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
 OTHER DEALINGS IN THE SOFTWARE.
 """
+import pickle
+
 import pytest
 
 from chainsmoke.validate import validate_it, ChainSmokeValidationError
@@ -93,3 +95,16 @@ def test_that_validate_it_works_on_function_with_inner_varnames():
 
     assert exception_info.value.args[
                0] == "add_two expects type <class 'int'> for arg y but received value 5 with type of <class 'str'>"
+
+
+@validate_it
+def add_two_validated(x: int, y: int) -> int:
+    return x + y
+
+
+def test_that_validated_functions_can_be_pickled():
+    unpickled = pickle.loads(pickle.dumps(add_two_validated))
+
+    assert unpickled(1, 2) == 3
+    with pytest.raises(TypeError):
+        unpickled(1, '2')